@@ -1,10 +1,13 @@
 # exams/admin.py
 
 from django.contrib import admin
-from .models import Exam, Question, Option, StudentExamResult, StudentExamSummary, Notification
+from .models import Exam, Question, Option, StudentExamResult, StudentExamSummary, Notification, ExamSubmission, ExamAttempt, ProctoringSummary, SemesterGradebook
 from django import forms
 from django.utils.html import format_html
-from django.utils.safestring import mark_safe
+from django.db.models import Prefetch
+from django.template.loader import render_to_string
+from django.contrib import messages
+from .results_export import export_response
 
 
 class ExamForm(forms.ModelForm):
@@ -46,6 +49,22 @@ class ExamAdmin(admin.ModelAdmin):
     get_department.admin_order_field = 'teacher__department'
     get_department.short_description = 'Department'
 
+    actions = ['export_results']
+
+    @admin.action(description="Export results of the selected exam (CSV)")
+    def export_results(self, request, queryset):
+        if queryset.count() != 1:
+            self.message_user(request, "Select exactly one exam to export.", messages.WARNING)
+            return None
+        return export_response(queryset.get())
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # questions added or edited through the inline invalidate the cached answer key
+        # and recount the exam totals, on a new exam as well
+        if any(formset.has_changed() for formset in formsets):
+            form.instance.bump_version()
+
 class OptionInline(admin.TabularInline):    # or StackedInline for a diffrent style
     model = Option
     extrea = 4 # display four option
@@ -96,6 +115,7 @@ class StudentExamResultAdmin(admin.ModelAdmin):
 
 class StudentExamSummaryAdmin(admin.ModelAdmin):
     list_display = ['student', 'exam', 'total_marks', 'total_questions']
+    list_select_related = ['student', 'exam']
     list_filter = ['exam']
     search_fields = ['student__user__username', 'exam__title']
     readonly_fields = ['exam_details']  # This will show detailed Q&A info
@@ -108,35 +128,49 @@ class StudentExamSummaryAdmin(admin.ModelAdmin):
 
 
     def exam_details(self, obj):
-        results = obj.exam_results.select_related('question', 'selected_option').all()
+        # correct options of every question come from one prefetch, not one query per answer
+        results = StudentExamResult.objects.filter(student=obj.student_id, exam=obj.exam_id).select_related(
+            'question', 'selected_option'
+        ).prefetch_related(
+            Prefetch('question__Options', queryset=Option.objects.filter(is_correct=True), to_attr='correct_options')
+        ).order_by('question_id')
 
-        if not results:
-            return "No detailed results available."
+        return render_to_string("admin/exam/studentexamsummary/exam_details.html", {'results': results})
 
-        html = "<ul style='list-style:none;'>"
-        for res in results:
-            question_text = res.question.text if res.question else "Question Missing"
-            correct_option = res.question.Options.filter(is_correct=True).first() if res.question else None
-            correct_text = correct_option.text if correct_option else "N/A"
-            student_answer = res.selected_option.text if res.selected_option else "Not Answered"
-            status = '✅' if res.is_correct else '❌'
 
-            html += f"""
-            <li>
-                <strong>Q:</strong> {question_text}<br>
-                <strong>Correct Answer:</strong> {correct_text}<br>
-                <strong>Student Answer:</strong> {student_answer}<br>
-                <strong>Is Correct:</strong> {status}
-                <br><br>
-            </li>
-            """
-        html += "</ul>"
+    exam_details.short_description = "Question-wise Details"
 
-        return mark_safe(html)
 
 
-    exam_details.short_description = "Question-wise Details"
+class ExamSubmissionAdmin(admin.ModelAdmin):
+    list_display = ('receipt', 'student', 'exam', 'status', 'total_marks', 'created_at', 'graded_at')
+    list_filter = ('status', 'exam')
+    search_fields = ('student__full_name', 'exam__title')
+    readonly_fields = ('receipt', 'worker', 'claimed_at', 'created_at', 'graded_at')
+
+
+class ExamAttemptAdmin(admin.ModelAdmin):
+    list_display = ('student', 'exam', 'started_at', 'deadline', 'submitted_at')
+    list_filter = ('exam',)
+    search_fields = ('student__full_name', 'exam__title')
+    list_select_related = ('student', 'exam')
+
+
+
+class ProctoringSummaryAdmin(admin.ModelAdmin):
+    list_display = ('student', 'exam', 'total_events', 'tab_hidden', 'window_blur', 'copy', 'paste',
+                    'fullscreen_exit', 'last_event_at')
+    list_filter = ('exam',)
+    search_fields = ('student__full_name', 'exam__title')
+    list_select_related = ('student', 'exam')
+
 
+class SemesterGradebookAdmin(admin.ModelAdmin):
+    list_display = ('student', 'department', 'samester', 'exams_attempted', 'total_marks', 'updated_at')
+    list_filter = ('department', 'samester')
+    search_fields = ('student__full_name', 'student__roll_number')
+    list_select_related = ('student', 'department')
+    readonly_fields = ('exams_attempted', 'total_marks', 'updated_at')
 
 
 class NotificationAdmin(admin.ModelAdmin):
@@ -146,4 +180,8 @@ class NotificationAdmin(admin.ModelAdmin):
 admin.site.register(Exam, ExamAdmin)
 admin.site.register(StudentExamResult, StudentExamResultAdmin)
 admin.site.register(StudentExamSummary, StudentExamSummaryAdmin)
-admin.site.register(Notification, NotificationAdmin)
\ No newline at end of file
+admin.site.register(Notification, NotificationAdmin)
+admin.site.register(ExamSubmission, ExamSubmissionAdmin)
+admin.site.register(ExamAttempt, ExamAttemptAdmin)
+admin.site.register(ProctoringSummary, ProctoringSummaryAdmin)
+admin.site.register(SemesterGradebook, SemesterGradebookAdmin)
\ No newline at end of file
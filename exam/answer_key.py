@@ -0,0 +1,63 @@
+# exam/answer_key.py
+
+from functools import lru_cache
+
+from django.core.cache import cache
+
+from .models import Question
+
+
+'''Compiled answer key of an exam
+
+    question id -> (correct option id, marks, frozenset of option ids of that question)
+
+    Keys are cached per (exam id, exam version). Any change to questions or options
+    goes through Exam.bump_version(), so an old key is never read again and just
+    ages out of the caches.
+'''
+
+ANSWER_KEY_TIMEOUT = 60 * 60 * 24
+
+
+def answer_key_cache_key(exam_id, version):
+    return f"exam:answer_key:{exam_id}:{version}"
+
+
+def compile_answer_key(exam_id):
+    # one LEFT JOIN over question/options, Option models are never built
+    rows = Question.objects.filter(exam_id=exam_id).values_list(
+        'id', 'marks', 'Options__id', 'Options__is_correct'
+    )
+
+    correct = {}
+    marks = {}
+    option_ids = {}
+    for question_id, question_marks, option_id, is_correct in rows:
+        marks[question_id] = question_marks
+        correct.setdefault(question_id, None)
+        option_ids.setdefault(question_id, set())
+        if option_id is None:
+            continue
+        option_ids[question_id].add(option_id)
+        if is_correct:
+            correct[question_id] = option_id
+
+    return {
+        question_id: (correct[question_id], marks[question_id], frozenset(option_ids[question_id]))
+        for question_id in sorted(marks)
+    }
+
+
+@lru_cache(maxsize=256)
+def _load_answer_key(exam_id, version):
+    key = answer_key_cache_key(exam_id, version)
+    answer_key = cache.get(key)
+    if answer_key is None:
+        answer_key = compile_answer_key(exam_id)
+        cache.set(key, answer_key, ANSWER_KEY_TIMEOUT)
+    return answer_key
+
+
+def get_answer_key(exam):
+    # in-process LRU first, then the shared Django cache, then the database
+    return _load_answer_key(exam.id, exam.version)
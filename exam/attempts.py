@@ -0,0 +1,129 @@
+# exam/attempts.py
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.utils import timezone
+
+from .answer_key import get_answer_key
+from .autosave import seal_attempt
+from .models import ExamAttempt
+from .proctoring import flush_events
+
+
+'''Server side exam timer
+
+    The first time a student opens a paper an ExamAttempt row is written with
+    the start time and the deadline (start + duration, capped at the exam's
+    end_time) and the same two timestamps go into the cache. Every later check
+    (page reload, autosave, submit) is one cache read and never writes, so the
+    session is not touched. On a cache miss the row is read back once.
+
+    Submits up to GRACE_SECONDS after the deadline are accepted to allow for
+    the auto-submit round trip; later ones are closed with whatever was
+    autosaved before the deadline. Attempts nobody submitted at all are closed
+    the same way by `python manage.py close_expired_attempts`.
+'''
+
+GRACE_SECONDS = getattr(settings, 'EXAM_SUBMIT_GRACE_SECONDS', 30)
+# kept this long after the deadline so late requests still find the attempt
+ATTEMPT_CACHE_AFTER = 60 * 60 * 6
+
+
+@dataclass
+class AttemptWindow:
+    started_at: datetime
+    deadline: datetime
+    submitted: bool = False
+
+    def remaining_seconds(self, now=None):
+        now = now or timezone.now()
+        return max(0, int((self.deadline - now).total_seconds()))
+
+    def is_over(self, now=None):
+        # past the deadline and the grace period
+        now = now or timezone.now()
+        return now > self.deadline + timedelta(seconds=GRACE_SECONDS)
+
+
+def attempt_cache_key(exam_id, student_id):
+    return f"exam:attempt:{exam_id}:{student_id}"
+
+
+def _to_cache(exam_id, student_id, window):
+    timeout = window.remaining_seconds() + GRACE_SECONDS + ATTEMPT_CACHE_AFTER
+    cache.set(
+        attempt_cache_key(exam_id, student_id),
+        (window.started_at.timestamp(), window.deadline.timestamp(), window.submitted),
+        timeout,
+    )
+
+
+def _from_row(attempt):
+    return AttemptWindow(attempt.started_at, attempt.deadline, attempt.submitted_at is not None)
+
+
+def get_attempt(exam, student):
+    '''The student's attempt window, or None if they never opened the paper.'''
+    cached = cache.get(attempt_cache_key(exam.id, student.id))
+    if cached is not None:
+        started_at, deadline, submitted = cached
+        return AttemptWindow(
+            datetime.fromtimestamp(started_at, dt_timezone.utc),
+            datetime.fromtimestamp(deadline, dt_timezone.utc),
+            submitted,
+        )
+
+    attempt = ExamAttempt.objects.filter(exam=exam, student=student).first()
+    if attempt is None:
+        return None
+    window = _from_row(attempt)
+    _to_cache(exam.id, student.id, window)
+    return window
+
+
+def start_attempt(exam, student):
+    '''Return the running attempt, creating it on the first open of the paper.'''
+    window = get_attempt(exam, student)
+    if window is not None:
+        return window
+
+    now = timezone.now()
+    deadline = min(now + timedelta(minutes=exam.duration_miniutes), exam.end_time)
+    try:
+        attempt = ExamAttempt.objects.create(exam=exam, student=student, started_at=now, deadline=deadline)
+    except IntegrityError:
+        # opened in two tabs at once, the other request won
+        attempt = ExamAttempt.objects.get(exam=exam, student=student)
+    window = _from_row(attempt)
+    _to_cache(exam.id, student.id, window)
+    return window
+
+
+def mark_submitted(exam, student):
+    now = timezone.now()
+    ExamAttempt.objects.filter(exam=exam, student=student, submitted_at__isnull=True).update(submitted_at=now)
+    window = get_attempt(exam, student)
+    if window is not None and not window.submitted:
+        window.submitted = True
+        _to_cache(exam.id, student.id, window)
+
+
+def close_expired_attempts():
+    '''Submit every attempt that ran out without a submit, returns how many were closed.
+
+        Answers autosaved before the deadline are graded as the final paper.
+    '''
+    cutoff = timezone.now() - timedelta(seconds=GRACE_SECONDS)
+    expired = ExamAttempt.objects.filter(submitted_at__isnull=True, deadline__lt=cutoff).select_related('exam', 'student')
+
+    closed = 0
+    for attempt in expired.iterator():
+        seal_attempt(attempt.exam, attempt.student, get_answer_key(attempt.exam), {})
+        mark_submitted(attempt.exam, attempt.student)
+        flush_events(attempt.exam, attempt.student)
+        closed += 1
+    return closed
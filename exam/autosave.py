@@ -0,0 +1,109 @@
+# exam/autosave.py
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from .grading import grade_answer, grade_submission, stored_results, upsert_results
+from .models import ExamAttempt
+
+
+'''Answer autosave during a live exam
+
+    Deltas from the paper are buffered per (exam, student) in the cache. Only the
+    latest choice per question is kept, and the buffer is written to
+    StudentExamResult in one upsert once it holds FLUSH_ANSWERS answers or is
+    FLUSH_SECONDS old. The final submit just seals the attempt: it takes whatever
+    is still buffered and writes only the rows that changed.
+
+    The cache may drop a buffer at any time, so it is never the only copy: the
+    page keeps every answer it sent until a reply says it was flushed and sends
+    them again with the next delta, and asks for an immediate flush when it is
+    closed or reloaded.
+
+    A flush only writes while the attempt is open: it first locks the
+    ExamAttempt row, and grading marks that row submitted in its own
+    transaction, so answers arriving after the submit never change graded rows.
+'''
+
+FLUSH_SECONDS = getattr(settings, 'EXAM_AUTOSAVE_FLUSH_SECONDS', 30)
+FLUSH_ANSWERS = getattr(settings, 'EXAM_AUTOSAVE_FLUSH_ANSWERS', 10)
+BUFFER_TIMEOUT = 60 * 60 * 6
+
+
+def autosave_cache_key(exam_id, student_id):
+    return f"exam:autosave:{exam_id}:{student_id}"
+
+
+def record_answers(exam, student, answer_key, deltas, flush=False):
+    '''Buffer answer deltas {question id: option id}, flushing when due (or asked to).
+
+        Returns (answers still buffered, answers written).
+    '''
+    key = autosave_cache_key(exam.id, student.id)
+    buffer = cache.get(key) or {'answers': {}, 'since': time.time()}
+
+    for question_id, value in deltas.items():
+        if question_id in answer_key:
+            buffer['answers'][question_id] = value
+
+    pending = buffer['answers']
+    if flush or len(pending) >= FLUSH_ANSWERS or time.time() - buffer['since'] >= FLUSH_SECONDS:
+        written = flush_answers(exam, student, answer_key, pending)
+        cache.delete(key)
+        return 0, written
+
+    cache.set(key, buffer, BUFFER_TIMEOUT)
+    return len(pending), 0
+
+
+def flush_answers(exam, student, answer_key, answers):
+    '''Write buffered answers, returns how many; nothing once the attempt was submitted.'''
+    graded = {
+        question_id: grade_answer(answer_key, question_id, value)
+        for question_id, value in answers.items()
+    }
+    with transaction.atomic():
+        # a no-op write that locks the open attempt row (and takes sqlite's write
+        # lock) before anything is read or written
+        is_open = ExamAttempt.objects.filter(
+            exam_id=exam.id, student_id=student.id, submitted_at__isnull=True
+        ).update(deadline=F('deadline'))
+        if not is_open:
+            return 0
+        return upsert_results(exam, student, graded)
+
+
+def saved_answers(exam, student):
+    '''{question id: option id} the student has saved so far, buffered answers over stored rows.'''
+    answers = {
+        question_id: selected_option_id
+        for question_id, (selected_option_id, _, _) in stored_results(exam, student).items()
+        if selected_option_id is not None
+    }
+    buffer = cache.get(autosave_cache_key(exam.id, student.id))
+    if buffer is not None:
+        answers.update({question_id: value for question_id, value in buffer['answers'].items() if value})
+    return answers
+
+
+def pop_buffered_answers(exam, student):
+    key = autosave_cache_key(exam.id, student.id)
+    buffer = cache.get(key)
+    if buffer is None:
+        return {}
+    cache.delete(key)
+    return buffer['answers']
+
+
+def seal_attempt(exam, student, answer_key, posted_answers):
+    '''Final submission: merge buffered and posted answers over the saved rows.
+
+        A posted answer wins over a buffered one, a buffered one over a saved one.
+    '''
+    answers = pop_buffered_answers(exam, student)
+    answers.update({question_id: value for question_id, value in posted_answers.items() if value})
+    return grade_submission(exam, student, answer_key, answers, merge_stored=True)
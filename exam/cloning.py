@@ -0,0 +1,59 @@
+# exam/cloning.py
+
+from django.db import transaction
+
+from .models import Exam, Option, Question
+
+
+'''Copy an exam paper into a new exam
+
+    The source questions and options are read with two value queries and the
+    copy is written in dependency order, exam -> questions -> options, with
+    one bulk_create per model. New question ids come back from the bulk insert
+    and old ids are remapped in memory, so a 100 question paper is cloned in a
+    handful of statements whatever its size.
+'''
+
+
+def clone_exam(exam, teacher, start_time, end_time, question_ids=None, **overrides):
+    '''Clone `exam` for `teacher` with a new time window, returns the new Exam.
+
+        question_ids limits the copy to those questions of the exam (None copies
+        all of them). overrides may set title, description, samester and
+        duration_miniutes, anything left out is taken from the source exam.
+    '''
+    questions = Question.objects.filter(exam=exam).order_by('id')
+    if question_ids is not None:
+        questions = questions.filter(id__in=question_ids)
+    questions = list(questions.values_list('id', 'text', 'marks'))
+
+    options = Option.objects.filter(question_id__in=[question_id for question_id, _, _ in questions]).order_by(
+        'question_id', 'id'
+    ).values_list('question_id', 'text', 'is_correct')
+
+    with transaction.atomic():
+        clone = Exam.objects.create(
+            title=overrides.get('title') or exam.title,
+            description=overrides.get('description', exam.description),
+            teacher=teacher,
+            department=teacher.department,
+            samester=overrides.get('samester') or exam.samester,
+            start_time=start_time,
+            end_time=end_time,
+            duration_miniutes=overrides.get('duration_miniutes') or exam.duration_miniutes,
+            # totals are known already, no need to recount them
+            question_count=len(questions),
+            total_marks=sum(marks for _, _, marks in questions),
+        )
+
+        new_questions = Question.objects.bulk_create([
+            Question(exam=clone, text=text, marks=marks) for _, text, marks in questions
+        ])
+        remap = {old_id: new.id for (old_id, _, _), new in zip(questions, new_questions)}
+
+        Option.objects.bulk_create([
+            Option(question_id=remap[question_id], text=text, is_correct=is_correct)
+            for question_id, text, is_correct in options
+        ])
+
+    return clone
@@ -0,0 +1,147 @@
+# exam/gradebook.py
+
+import csv
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.http import HttpResponse
+
+from .models import Exam, SemesterGradebook, StudentExamSummary
+
+
+'''Semester gradebook
+
+    Per (student, exam) the gradebook cell is the StudentExamSummary row that
+    grading already maintains. Per student and (department, samester) the
+    SemesterGradebook row holds the totals over all exams of that semester:
+
+    - grading moves it by (new exam total - previous exam total) with one
+      F() UPDATE, and counts the exam when it is the first attempt
+    - regrade moves it by the same per-student delta as the summaries
+    - recompute, an exam moving to another semester or department and a
+      deleted exam rebuild the affected semesters from one GROUP BY over
+      StudentExamSummary
+
+    The class gradebook page and its CSV export read one row per student and
+    never touch StudentExamResult.
+'''
+
+
+def record_exam_total(exam, student, previous_marks, total_marks):
+    '''Move the student's semester totals after grading (previous_marks is None on a first attempt).'''
+    first_attempt = previous_marks is None
+    delta = total_marks - (previous_marks or 0)
+    if not delta and not first_attempt:
+        return
+
+    updated = SemesterGradebook.objects.filter(
+        student_id=student.id, department_id=exam.department_id, samester=exam.samester
+    ).update(
+        total_marks=F('total_marks') + delta,
+        exams_attempted=F('exams_attempted') + int(first_attempt),
+    )
+    if updated:
+        return
+
+    try:
+        with transaction.atomic():
+            SemesterGradebook.objects.create(
+                student_id=student.id, department_id=exam.department_id, samester=exam.samester,
+                total_marks=total_marks, exams_attempted=1,
+            )
+    except IntegrityError:
+        # created by a concurrent grading of another exam
+        record_exam_total(exam, student, previous_marks, total_marks)
+
+
+def rebuild_gradebook(department_id, samester):
+    '''Rebuild one semester's rows from StudentExamSummary, returns the number of students.'''
+    totals = (
+        StudentExamSummary.objects.filter(exam__department_id=department_id, exam__samester=samester)
+        .values('student_id')
+        .annotate(total_marks=Sum('total_marks'), exams_attempted=Count('id'))
+        .order_by()
+    )
+    rows = [
+        SemesterGradebook(
+            student_id=row['student_id'],
+            department_id=department_id,
+            samester=samester,
+            total_marks=row['total_marks'] or 0,
+            exams_attempted=row['exams_attempted'],
+        )
+        for row in totals
+    ]
+
+    with transaction.atomic():
+        # students whose every exam of the semester is gone
+        SemesterGradebook.objects.filter(department_id=department_id, samester=samester).exclude(
+            student_id__in=[row.student_id for row in rows]
+        ).delete()
+        SemesterGradebook.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['student', 'department', 'samester'],
+            update_fields=['total_marks', 'exams_attempted', 'updated_at'],
+        )
+    return len(rows)
+
+
+def rebuild_exam_gradebook(exam_id):
+    department_id, samester = Exam.objects.values_list('department_id', 'samester').get(id=exam_id)
+    return rebuild_gradebook(department_id, samester)
+
+
+def semester_gradebook(department_id, samester):
+    '''(exams of the semester, rows) for the class gradebook page, three queries.
+
+        Each row is {'gradebook', 'cells', 'percent'}: the student's
+        SemesterGradebook, the exam total (or None) under every exam column and
+        the semester total against the marks of all the semester's exams.
+    '''
+    exams = list(
+        Exam.objects.filter(department_id=department_id, samester=samester)
+        .order_by('start_time')
+        .only('id', 'title', 'start_time', 'total_marks')
+    )
+    column = {exam.id: index for index, exam in enumerate(exams)}
+    possible = sum(exam.total_marks for exam in exams)
+
+    cells = {}
+    for student_id, exam_id, total_marks in StudentExamSummary.objects.filter(
+        exam_id__in=column
+    ).values_list('student_id', 'exam_id', 'total_marks'):
+        cells.setdefault(student_id, [None] * len(exams))[column[exam_id]] = total_marks
+
+    gradebooks = (
+        SemesterGradebook.objects.filter(department_id=department_id, samester=samester)
+        .select_related('student')
+        .order_by('-total_marks', 'student__full_name')
+    )
+    rows = [
+        {
+            'gradebook': gradebook,
+            'cells': cells.get(gradebook.student_id, [None] * len(exams)),
+            'percent': round(gradebook.total_marks * 100 / possible, 1) if possible else None,
+        }
+        for gradebook in gradebooks
+    ]
+    return exams, rows
+
+
+def export_response(department_id, samester):
+    exams, rows = semester_gradebook(department_id, samester)
+
+    response = HttpResponse(content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="gradebook-{department_id}-semester-{samester}.csv"'
+    writer = csv.writer(response)
+    writer.writerow(['Student', 'Roll Number'] + [exam.title for exam in exams]
+                    + ['Exams Attempted', 'Total Marks', 'Percent'])
+    for row in rows:
+        gradebook = row['gradebook']
+        writer.writerow(
+            [gradebook.student.full_name, gradebook.student.roll_number or '']
+            + ['' if marks is None else marks for marks in row['cells']]
+            + [gradebook.exams_attempted, gradebook.total_marks, '' if row['percent'] is None else row['percent']]
+        )
+    return response
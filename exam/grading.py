@@ -0,0 +1,153 @@
+# exam/grading.py
+
+import logging
+import time
+from dataclasses import dataclass
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import ExamAttempt, StudentExamResult
+from .gradebook import record_exam_total
+from .leaderboard import record_score
+from .summaries import lock_summary, upsert_summary
+
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCounter:
+    # installed with connection.execute_wrapper() to count round trips
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+@dataclass
+class GradingReport:
+    total_marks: int = 0
+    correct_answers: int = 0
+    total_questions: int = 0
+    query_count: int = 0
+    duration_ms: float = 0.0
+
+
+def answers_from_post(post, answer_key):
+    # the paper posts one radio group per question: q_correct_<question id>
+    return {question_id: post.get(f"q_correct_{question_id}") for question_id in answer_key}
+
+
+def _parse_option_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def grade_answer(answer_key, question_id, value):
+    '''(selected option id, is_correct, mark_obtains) for one answer.
+
+        An option that does not belong to the question is treated as not answered.
+    '''
+    correct_option_id, marks, option_ids = answer_key[question_id]
+    selected_option_id = _parse_option_id(value)
+    if selected_option_id not in option_ids:
+        selected_option_id = None
+
+    is_correct = selected_option_id is not None and selected_option_id == correct_option_id
+    return selected_option_id, is_correct, marks if is_correct else 0
+
+
+def stored_results(exam, student):
+    # question id -> (selected option id, is_correct, mark_obtains) already in the database
+    rows = StudentExamResult.objects.filter(exam=exam, student=student).values_list(
+        'question_id', 'selected_option_id', 'is_correct', 'mark_obtains'
+    )
+    return {question_id: (selected_option_id, is_correct, mark_obtains)
+            for question_id, selected_option_id, is_correct, mark_obtains in rows}
+
+
+def upsert_results(exam, student, graded):
+    '''Write graded answers {question id: (selected option id, is_correct, mark)} with one upsert.'''
+    rows = [
+        StudentExamResult(
+            exam_id=exam.id,
+            student_id=student.id,
+            question_id=question_id,
+            selected_option_id=selected_option_id,
+            is_correct=is_correct,
+            mark_obtains=mark_obtains,
+        )
+        for question_id, (selected_option_id, is_correct, mark_obtains) in graded.items()
+    ]
+    if rows:
+        # one upsert instead of update_or_create per question
+        StudentExamResult.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['student', 'question', 'exam'],
+            update_fields=['selected_option', 'is_correct', 'mark_obtains'],
+        )
+    return len(rows)
+
+
+def close_attempt(exam, student):
+    ExamAttempt.objects.filter(exam_id=exam.id, student_id=student.id, submitted_at__isnull=True).update(
+        submitted_at=timezone.now()
+    )
+
+
+def grade_submission(exam, student, answer_key, answers, merge_stored=False):
+    '''Grade one submission in memory and write the StudentExamResult rows in one transaction.
+
+        answer_key is the compiled key from exam.answer_key.get_answer_key().
+        answers maps question id -> selected option id (as posted, may be missing or junk).
+
+        With merge_stored the rows already saved (autosave) are read first, a posted
+        answer overrides the saved one and only rows that actually change are written.
+        The StudentExamSummary, the exam leaderboard and the semester gradebook are updated
+        and the student's ExamAttempt is marked submitted in the same transaction.
+    '''
+    report = GradingReport()
+    counter = QueryCounter()
+    started = time.perf_counter()
+
+    with connection.execute_wrapper(counter), transaction.atomic():
+        # the attempt is closed first, autosave flushes (exam/autosave.py) never
+        # write over the rows graded here; both statements are writes, so the
+        # transaction holds its locks before anything is read
+        close_attempt(exam, student)
+        previous_marks = lock_summary(exam, student)
+        stored = stored_results(exam, student) if merge_stored else {}
+
+        changed = {}
+        for question_id in answer_key:
+            value = answers.get(question_id)
+            if not value and question_id in stored:
+                value = stored[question_id][0]
+
+            graded = grade_answer(answer_key, question_id, value)
+            if stored.get(question_id) != graded:
+                changed[question_id] = graded
+
+            report.total_marks += graded[2]
+            report.total_questions += 1
+            if graded[1]:
+                report.correct_answers += 1
+
+        upsert_results(exam, student, changed)
+        upsert_summary(exam, student, report.total_marks, report.total_questions)
+        record_score(exam, previous_marks, report.total_marks)
+        record_exam_total(exam, student, previous_marks, report.total_marks)
+
+    report.query_count = counter.count
+    report.duration_ms = (time.perf_counter() - started) * 1000
+    logger.info(
+        "graded exam=%s student=%s questions=%s written=%s marks=%s queries=%s time=%.1fms",
+        exam.id, student.id, report.total_questions, len(changed), report.total_marks,
+        report.query_count, report.duration_ms,
+    )
+    return report
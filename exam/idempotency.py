@@ -0,0 +1,84 @@
+# exam/idempotency.py
+
+import uuid
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import SubmissionClaim
+
+
+'''Duplicate submit suppression
+
+    Every rendered paper carries a fresh submission key in a hidden input. The
+    first POST with a key claims it by inserting a SubmissionClaim row: the
+    unique (exam, student, key) constraint lets exactly one request win, on any
+    cache backend and across workers. The winner stores its outcome (flash
+    message + redirect) on the row and in the cache when done.
+
+    A double-click or a retry with the same key never grades again and never
+    waits: it gets the stored outcome back (one cache read, the row on a miss),
+    or PENDING right away while the first request is still grading.
+
+    A claim is only needed while the same paper can still be resent, so rows
+    live for CLAIM_LIFETIME and `python manage.py close_expired_attempts`
+    deletes the expired ones.
+'''
+
+OUTCOME_TIMEOUT = 60 * 30
+CLAIM_LIFETIME = timedelta(seconds=OUTCOME_TIMEOUT)
+PENDING = 'pending'
+
+
+def new_submission_key():
+    return uuid.uuid4().hex
+
+
+def submission_cache_key(exam_id, student_id, submission_key):
+    return f"exam:submit:{exam_id}:{student_id}:{submission_key}"
+
+
+def claim_submission(exam, student, submission_key):
+    '''True for the first request with this key, False for a repeat.'''
+    try:
+        with transaction.atomic():
+            SubmissionClaim.objects.create(exam_id=exam.id, student_id=student.id, key=submission_key,
+                                           expires_at=timezone.now() + CLAIM_LIFETIME)
+    except IntegrityError:
+        return False
+    return True
+
+
+def store_outcome(exam, student, submission_key, outcome):
+    SubmissionClaim.objects.filter(exam_id=exam.id, student_id=student.id, key=submission_key).update(
+        outcome=outcome
+    )
+    cache.set(submission_cache_key(exam.id, student.id, submission_key), outcome, OUTCOME_TIMEOUT)
+
+
+def release_submission(exam, student, submission_key):
+    # the first request failed, let a retry do the work
+    SubmissionClaim.objects.filter(exam_id=exam.id, student_id=student.id, key=submission_key).delete()
+
+
+def stored_outcome(exam, student, submission_key):
+    '''Outcome stored by the first request, PENDING while it is still running.'''
+    outcome = cache.get(submission_cache_key(exam.id, student.id, submission_key))
+    if outcome is not None:
+        return outcome
+
+    outcome = SubmissionClaim.objects.filter(
+        exam_id=exam.id, student_id=student.id, key=submission_key
+    ).values_list('outcome', flat=True).first()
+    if outcome is None:
+        return PENDING
+    cache.set(submission_cache_key(exam.id, student.id, submission_key), outcome, OUTCOME_TIMEOUT)
+    return outcome
+
+
+def delete_expired_claims():
+    '''Delete the claims past their lifetime, returns how many.'''
+    deleted, _ = SubmissionClaim.objects.filter(expires_at__lt=timezone.now()).delete()
+    return deleted
@@ -0,0 +1,116 @@
+# exam/item_analysis.py
+
+import numpy as np
+from django.core.cache import cache
+
+from .models import Option, Question, StudentExamResult, StudentExamSummary
+
+
+'''Item analysis of an exam
+
+    The result set is pulled as flat arrays in one query and turned into a
+    student x question matrix, every statistic is then computed column-wise:
+
+        difficulty      share of students who answered the question correctly (p-value)
+        discrimination  point-biserial correlation of the question with the rest score
+        pick rate       share of students who picked each option
+
+    Reports are cached per (exam, version, number of attempts).
+'''
+
+REPORT_TIMEOUT = 60 * 60
+
+
+def item_analysis_cache_key(exam_id, version, attempts):
+    return f"exam:item_analysis:{exam_id}:{version}:{attempts}"
+
+
+def _column_correlation(x, y):
+    # Pearson correlation of every column of x with the same column of y
+    xc = x - x.mean(axis=0)
+    yc = y - y.mean(axis=0)
+    denominator = np.sqrt((xc ** 2).sum(axis=0) * (yc ** 2).sum(axis=0))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        r = (xc * yc).sum(axis=0) / denominator
+    return np.where(denominator > 0, r, np.nan)
+
+
+def _round(value):
+    return None if np.isnan(value) else round(float(value), 3)
+
+
+def build_item_analysis(exam_id):
+    questions = list(Question.objects.filter(exam_id=exam_id).order_by('id').values_list('id', 'text', 'marks'))
+    options = list(
+        # sorted by id for the searchsorted below, grouped per question afterwards
+        Option.objects.filter(question__exam_id=exam_id).order_by('id')
+        .values_list('id', 'question_id', 'text', 'is_correct')
+    )
+    rows = StudentExamResult.objects.filter(exam_id=exam_id).values_list(
+        'student_id', 'question_id', 'selected_option_id', 'mark_obtains', 'is_correct'
+    )
+    results = np.array(
+        [(s, q, o if o is not None else -1, m, c) for s, q, o, m, c in rows],
+        dtype=np.int64,
+    ).reshape(-1, 5)
+
+    question_ids = np.array([question_id for question_id, _, _ in questions], dtype=np.int64)
+    report = {'students': 0, 'questions': []}
+    if not len(question_ids):
+        return report
+
+    # results of deleted questions are ignored
+    results = results[np.isin(results[:, 1], question_ids)]
+    student_ids, student_index = np.unique(results[:, 0], return_inverse=True)
+    question_index = np.searchsorted(question_ids, results[:, 1])
+    n_students, n_questions = len(student_ids), len(question_ids)
+    report['students'] = n_students
+
+    correct = np.zeros((n_students, n_questions))
+    marks = np.zeros((n_students, n_questions))
+    correct[student_index, question_index] = results[:, 4]
+    marks[student_index, question_index] = results[:, 3]
+
+    if n_students:
+        difficulty = correct.mean(axis=0)
+        rest_score = marks.sum(axis=1, keepdims=True) - marks
+        discrimination = _column_correlation(correct, rest_score)
+    else:
+        difficulty = discrimination = np.full(n_questions, np.nan)
+
+    # how many students picked each option, one bincount over all answers
+    option_ids = np.array([option[0] for option in options], dtype=np.int64)
+    picked = results[:, 2]
+    picked = picked[np.isin(picked, option_ids)]
+    pick_counts = np.bincount(np.searchsorted(option_ids, picked), minlength=len(option_ids))
+    answered = np.bincount(question_index[results[:, 2] >= 0], minlength=n_questions)
+
+    options_by_question = {}
+    for position, (option_id, question_id, text, is_correct) in enumerate(options):
+        options_by_question.setdefault(question_id, []).append({
+            'text': text,
+            'is_correct': is_correct,
+            'pick_rate': round(pick_counts[position] / n_students, 3) if n_students else None,
+        })
+
+    for position, (question_id, text, question_marks) in enumerate(questions):
+        report['questions'].append({
+            'id': question_id,
+            'text': text,
+            'marks': question_marks,
+            'difficulty': _round(difficulty[position]),
+            'discrimination': _round(discrimination[position]),
+            'unanswered_rate': round(1 - answered[position] / n_students, 3) if n_students else None,
+            'options': options_by_question.get(question_id, []),
+        })
+    return report
+
+
+def get_item_analysis(exam):
+    attempts = StudentExamSummary.objects.filter(exam=exam).count()
+    key = item_analysis_cache_key(exam.id, exam.version, attempts)
+    report = cache.get(key)
+    if report is None:
+        report = build_item_analysis(exam.id)
+        cache.set(key, report, REPORT_TIMEOUT)
+    return report
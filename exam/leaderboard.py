@@ -0,0 +1,123 @@
+# exam/leaderboard.py
+
+from django.db.models import Count
+
+from .models import ExamLeaderboard, StudentExamSummary
+
+
+'''Exam leaderboard
+
+    Every exam keeps how many students got each integer score in a Fenwick
+    (binary indexed) tree stored on ExamLeaderboard. Grading moves one student
+    from the old score to the new one in O(log max marks), and rank/percentile
+    of any score is a prefix sum of the same cost. Set-based changes (regrade,
+    recompute) rebuild it from one GROUP BY over StudentExamSummary.
+'''
+
+
+class FenwickTree:
+    def __init__(self, tree=None):
+        # tree[0] is unused, tree[i] covers score i - 1
+        self.tree = list(tree) if tree else [0]
+
+    @property
+    def size(self):
+        return len(self.tree) - 1
+
+    @classmethod
+    def from_counts(cls, counts):
+        tree = [0] + list(counts)
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        return cls(tree)
+
+    def counts(self):
+        return [self.prefix(score) - self.prefix(score - 1) for score in range(self.size)]
+
+    def grow(self, size):
+        if size > self.size:
+            counts = self.counts()
+            counts.extend([0] * (size - len(counts)))
+            self.tree = FenwickTree.from_counts(counts).tree
+
+    def add(self, score, delta):
+        self.grow(score + 1)
+        i = score + 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix(self, score):
+        # number of students with a score <= `score`
+        i = min(score + 1, self.size)
+        total = 0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+
+def record_score(exam, old_score, new_score):
+    '''Move one student from old_score (None for a first attempt) to new_score.
+
+        Call inside the grading transaction, after the summary is written, so the
+        board and the summary agree.
+    '''
+    if old_score == new_score:
+        return
+    board, created = ExamLeaderboard.objects.select_for_update().get_or_create(exam=exam)
+    if created:
+        # first board of an exam graded before: count every summary, this one included
+        rebuild_leaderboard(exam.id)
+        return
+    tree = FenwickTree(board.tree)
+    if old_score is not None:
+        tree.add(old_score, -1)
+    else:
+        board.students += 1
+    tree.add(new_score, 1)
+    board.tree = tree.tree
+    board.save(update_fields=['tree', 'students', 'updated_at'])
+
+
+def rebuild_leaderboard(exam_id):
+    rows = (
+        StudentExamSummary.objects.filter(exam_id=exam_id)
+        .values('total_marks')
+        .annotate(students=Count('id'))
+        .order_by()
+    )
+    counts = {row['total_marks']: row['students'] for row in rows}
+    size = max(counts, default=-1) + 1
+    tree = FenwickTree.from_counts([counts.get(score, 0) for score in range(size)])
+    ExamLeaderboard.objects.update_or_create(
+        exam_id=exam_id,
+        defaults={'tree': tree.tree, 'students': sum(counts.values())},
+    )
+
+
+class Standing:
+    def __init__(self, board):
+        self.tree = FenwickTree(board.tree if board else None)
+        self.students = board.students if board else 0
+
+    def rank(self, score):
+        # 1 + number of students with a strictly higher score
+        return 1 + self.students - self.tree.prefix(score)
+
+    def percentile(self, score):
+        # share of students scoring at or below `score`
+        if not self.students:
+            return None
+        return round(100 * self.tree.prefix(score) / self.students, 1)
+
+
+def get_standing(exam):
+    # works with exam__leaderboard already select_related
+    try:
+        board = exam.leaderboard
+    except ExamLeaderboard.DoesNotExist:
+        board = None
+    return Standing(board)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from exam.attempts import close_expired_attempts
+from exam.idempotency import delete_expired_claims
+
+
+class Command(BaseCommand):
+    help = ("Submit exam attempts whose time ran out, grading the answers autosaved before the deadline, "
+            "and delete expired submission claims")
+
+    def handle(self, *args, **options):
+        closed = close_expired_attempts()
+        deleted = delete_expired_claims()
+        self.stdout.write(self.style.SUCCESS(f"Closed {closed} expired attempts, deleted {deleted} expired claims"))
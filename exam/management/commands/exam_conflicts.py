@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from exam.models import Exam
+from exam.schedule import load_schedule, ScheduleIndex
+
+
+class Command(BaseCommand):
+    help = "List exams of the same department and semester whose time windows overlap"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--department", type=int, help="only this department id")
+        parser.add_argument("--semester", type=int, help="only this semester")
+
+    def handle(self, *args, **options):
+        cohorts = Exam.objects.all()
+        if options["department"] is not None:
+            cohorts = cohorts.filter(department_id=options["department"])
+        if options["semester"] is not None:
+            cohorts = cohorts.filter(samester=options["semester"])
+        cohorts = cohorts.values_list("department_id", "samester").distinct().order_by("department_id", "samester")
+
+        total = 0
+        for department_id, samester in cohorts:
+            # straight from the database, the report shouldn't trust a stale cache
+            pairs = ScheduleIndex(load_schedule(department_id, samester)).conflicts()
+            if not pairs:
+                continue
+
+            exams = Exam.objects.in_bulk({exam_id for pair in pairs for exam_id in pair})
+            self.stdout.write(f"department {department_id} semester {samester}: {len(pairs)} conflicts")
+            for first_id, second_id in pairs:
+                first, second = exams[first_id], exams[second_id]
+                self.stdout.write(
+                    f"  #{first.id} {first.title} ({first.start_time:%Y-%m-%d %H:%M} - {first.end_time:%H:%M})"
+                    f" overlaps #{second.id} {second.title} ({second.start_time:%Y-%m-%d %H:%M} - {second.end_time:%H:%M})"
+                )
+            total += len(pairs)
+
+        if total:
+            self.stdout.write(self.style.WARNING(f"{total} overlapping exam pairs"))
+        else:
+            self.stdout.write(self.style.SUCCESS("No overlapping exams"))
@@ -0,0 +1,239 @@
+import json
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from exam.models import Exam, Option, Question
+from faculty.models import TeacherProfile
+from student.models import StudentProfile
+from users.models import CustomUser, Department
+
+
+STEPS = ['login', 'open', 'autosave', 'submit']
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+OPTION_PATTERN = re.compile(r'name="q_correct_(\d+)" value="(\d+)"')
+
+
+def percentile(values, pct):
+    # nearest rank on an already sorted list
+    if not values:
+        return 0.0
+    index = max(0, min(len(values) - 1, round(pct / 100 * len(values) + 0.5) - 1))
+    return values[index]
+
+
+class LockWatch:
+    '''execute_wrapper that notices SQLite lock waits.
+
+        A write that blocks on another connection's lock sits in execute until
+        the busy timeout, so writes slower than `threshold_ms` are counted as
+        lock waits along with outright "database is locked" errors.
+    '''
+    def __init__(self, threshold_ms):
+        self.threshold = threshold_ms / 1000
+        self.waits = 0
+        self.wait_seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.monotonic()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.monotonic() - started
+            if elapsed >= self.threshold and sql.lstrip().upper().startswith(WRITE_STATEMENTS):
+                self.waits += 1
+                self.wait_seconds += elapsed
+
+
+class Command(BaseCommand):
+    help = ("Seed a synthetic exam and cohort, then drive concurrent simulated students through "
+            "login -> open paper -> autosave -> submit and report latency per step")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--students", type=int, default=50, help="Simulated students, one thread each")
+        parser.add_argument("--questions", type=int, default=20, help="Questions in the synthetic exam")
+        parser.add_argument("--autosaves", type=int, default=3, help="Autosave requests per student")
+        parser.add_argument("--think", type=float, default=0.0,
+                            help="Max random pause in seconds between steps of one student")
+        parser.add_argument("--lock-threshold", type=float, default=50.0,
+                            help="Writes slower than this many ms are counted as lock waits")
+        parser.add_argument("--keep", action="store_true", help="Keep the seeded exam and students")
+
+    def handle(self, *args, **options):
+        tag = f"lt{uuid.uuid4().hex[:6]}"
+        password = uuid.uuid4().hex
+
+        self.stdout.write(f"Seeding {options['students']} students and {options['questions']} questions ({tag})")
+        department, exam, roll_numbers = self.seed(tag, password, options)
+
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock_errors = defaultdict(int)
+        self.lock_waits = defaultdict(int)
+        self.lock_wait_seconds = defaultdict(float)
+        self.lock = threading.Lock()
+
+        # everybody starts together, like the first minute of an exam
+        barrier = threading.Barrier(len(roll_numbers))
+        threads = [
+            threading.Thread(target=self.simulate, args=(exam.id, roll_number, password, barrier, options))
+            for roll_number in roll_numbers
+        ]
+        # failed requests are counted in the report, not logged one traceback each
+        request_logger = logging.getLogger('django.request')
+        level = request_logger.level
+        request_logger.setLevel(logging.CRITICAL)
+
+        started = time.monotonic()
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            request_logger.setLevel(level)
+        elapsed = time.monotonic() - started
+
+        self.report(elapsed)
+
+        if options["keep"]:
+            self.stdout.write(f"Kept exam {exam.id} and department '{department.name}'")
+        else:
+            self.cleanup(tag, department)
+
+    def seed(self, tag, password, options):
+        department = Department.objects.create(name=f"Load test {tag}")
+        teacher = TeacherProfile.objects.create(
+            full_name=f"Load test teacher {tag}", department=department,
+            teacher_id=f"{tag}-t", password=password,
+        )
+
+        now = timezone.now()
+        exam = Exam.objects.create(
+            title=f"Load test {tag}", teacher=teacher, department=department, samester=1,
+            start_time=now - timedelta(minutes=1), end_time=now + timedelta(hours=2), duration_miniutes=60,
+        )
+        questions = Question.objects.bulk_create([
+            Question(exam=exam, text=f"Question {number}", marks=1 + number % 3)
+            for number in range(1, options["questions"] + 1)
+        ])
+        Option.objects.bulk_create([
+            Option(question=question, text=f"Option {index + 1}", is_correct=(index == 0))
+            for question in questions
+            for index in range(4)
+        ])
+        exam.bump_version()
+
+        # hash the shared password once, the login step still verifies it per student
+        hashed = make_password(password)
+        roll_numbers = [f"{tag}-{number:05d}" for number in range(options["students"])]
+        users = CustomUser.objects.bulk_create([
+            CustomUser(username=roll_number, roll_number=roll_number, password=hashed, user_type='student')
+            for roll_number in roll_numbers
+        ])
+        StudentProfile.objects.bulk_create([
+            StudentProfile(
+                user=user, full_name=f"Student {user.roll_number}", department=department, year=1,
+                samester=1, roll_number=user.roll_number, password=password,
+                profile_picture="student_profiles/loadtest.png",
+            )
+            for user in users
+        ])
+        return department, exam, roll_numbers
+
+    def simulate(self, exam_id, roll_number, password, barrier, options):
+        client = Client()
+        watch = LockWatch(options["lock_threshold"])
+        paper_url = reverse('student:start_exam', args=[exam_id])
+        autosave_url = reverse('student:autosave_exam', args=[exam_id])
+        answers = {}
+
+        def login():
+            response = client.post(reverse('student:login'), {'roll_number': roll_number, 'password': password})
+            return response.status_code == 302
+
+        def open_paper():
+            response = client.get(paper_url)
+            for question_id, option_id in OPTION_PATTERN.findall(response.content.decode()):
+                answers.setdefault(question_id, []).append(option_id)
+            return response.status_code == 200 and bool(answers)
+
+        def autosave():
+            picked = random.sample(sorted(answers), min(len(answers), 5))
+            body = json.dumps({'answers': {question_id: random.choice(answers[question_id]) for question_id in picked}})
+            response = client.post(autosave_url, body, content_type='application/json')
+            return response.status_code == 200
+
+        def submit():
+            data = {f"q_correct_{question_id}": random.choice(choices) for question_id, choices in answers.items()}
+            response = client.post(paper_url, data)
+            return response.status_code == 302
+
+        plan = [('login', login), ('open', open_paper)]
+        plan += [('autosave', autosave)] * options["autosaves"]
+        plan += [('submit', submit)]
+
+        try:
+            barrier.wait()
+            with connection.execute_wrapper(watch):
+                for step, request in plan:
+                    if options["think"]:
+                        time.sleep(random.uniform(0, options["think"]))
+                    waits, wait_seconds = watch.waits, watch.wait_seconds
+                    started = time.monotonic()
+                    try:
+                        ok = request()
+                        locked = False
+                    except OperationalError as e:
+                        ok, locked = False, 'locked' in str(e)
+                    except Exception:
+                        ok, locked = False, False
+                    elapsed_ms = (time.monotonic() - started) * 1000
+
+                    with self.lock:
+                        self.latencies[step].append(elapsed_ms)
+                        self.errors[step] += not ok
+                        self.lock_errors[step] += locked
+                        self.lock_waits[step] += watch.waits - waits
+                        self.lock_wait_seconds[step] += watch.wait_seconds - wait_seconds
+                    if not ok and step in ('login', 'open'):
+                        break   # the rest of this student's steps can't run
+        finally:
+            connection.close()
+
+    def report(self, elapsed):
+        total = sum(len(values) for values in self.latencies.values())
+        self.stdout.write(f"\n{total} requests in {elapsed:.1f}s ({total / elapsed:.1f} req/s)\n")
+        self.stdout.write(
+            f"{'step':<10}{'requests':>9}{'errors':>8}{'err %':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+            f"{'max ms':>9}{'locked':>8}{'lock waits':>11}{'wait ms':>9}"
+        )
+        for step in STEPS:
+            values = sorted(self.latencies[step])
+            if not values:
+                continue
+            errors = self.errors[step]
+            self.stdout.write(
+                f"{step:<10}{len(values):>9}{errors:>8}{100 * errors / len(values):>7.1f}"
+                f"{percentile(values, 50):>9.1f}{percentile(values, 95):>9.1f}{percentile(values, 99):>9.1f}"
+                f"{values[-1]:>9.1f}{self.lock_errors[step]:>8}{self.lock_waits[step]:>11}"
+                f"{self.lock_wait_seconds[step] * 1000:>9.0f}"
+            )
+
+    def cleanup(self, tag, department):
+        # exam, questions, answers and profiles go with the department
+        department.delete()
+        CustomUser.objects.filter(username__startswith=f"{tag}-").delete()
+        self.stdout.write(f"Removed the seeded data ({tag})")
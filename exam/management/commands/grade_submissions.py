@@ -0,0 +1,78 @@
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from exam.submission_queue import claim_submissions, grade_queued_submission, requeue_stale_submissions
+
+
+class Command(BaseCommand):
+    help = "Run grading workers that drain the exam submission queue"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=2, help="Number of worker threads")
+        parser.add_argument("--batch", type=int, default=20, help="Submissions claimed per round trip")
+        parser.add_argument("--rate", type=float, default=0,
+                            help="Max submissions graded per second across all workers (0 = no limit)")
+        parser.add_argument("--poll", type=float, default=1.0, help="Seconds to sleep when the queue is empty")
+        parser.add_argument("--stale-minutes", type=int, default=10,
+                            help="Requeue submissions claimed longer ago than this")
+        parser.add_argument("--once", action="store_true", help="Exit once the queue is empty")
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale_submissions(options["stale_minutes"])
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale submissions")
+
+        self.stop = threading.Event()
+        self.graded = 0
+        self.lock = threading.Lock()
+
+        # each worker may grade one submission per `interval` seconds
+        rate = options["rate"]
+        interval = options["workers"] / rate if rate else 0
+
+        threads = [
+            threading.Thread(target=self.work, args=(options, interval), daemon=True)
+            for _ in range(options["workers"])
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=1)
+        except KeyboardInterrupt:
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+
+        self.stdout.write(self.style.SUCCESS(f"Graded {self.graded} submissions"))
+
+    def work(self, options, interval):
+        worker = uuid.uuid4().hex
+        try:
+            while not self.stop.is_set():
+                close_old_connections()
+                submissions = claim_submissions(worker, options["batch"])
+
+                if not submissions:
+                    if options["once"]:
+                        return
+                    self.stop.wait(options["poll"])
+                    continue
+
+                for submission in submissions:
+                    started = time.monotonic()
+                    if grade_queued_submission(submission):
+                        with self.lock:
+                            self.graded += 1
+
+                    wait = interval - (time.monotonic() - started)
+                    if wait > 0:
+                        time.sleep(wait)
+        finally:
+            connection.close()
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from exam.models import Exam
+from exam.question_import import QuestionImportError, guess_format, import_questions
+
+
+class Command(BaseCommand):
+    help = "Import a CSV or JSON Lines question bank into an exam"
+
+    def add_arguments(self, parser):
+        parser.add_argument("exam_id", type=int)
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=["csv", "jsonl"], help="Defaults to the file extension")
+        parser.add_argument("--chunk-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        try:
+            exam = Exam.objects.get(id=options["exam_id"])
+        except Exam.DoesNotExist:
+            raise CommandError(f"Exam {options['exam_id']} does not exist")
+
+        file_format = options["format"] or guess_format(options["path"])
+        with open(options["path"], "rb") as file:
+            try:
+                imported = import_questions(exam, file, file_format, options["chunk_size"])
+            except QuestionImportError as e:
+                raise CommandError("Nothing imported:\n" + "\n".join(e.errors))
+
+        self.stdout.write(self.style.SUCCESS(f"Imported {imported} questions into exam {exam.id}"))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from exam.prewarm import prewarm_exam, upcoming_exams
+
+
+class Command(BaseCommand):
+    help = "Pre-build paper, answer key and available exams caches of exams about to start"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--minutes", type=int, default=10,
+                            help="Warm exams starting within this many minutes")
+        parser.add_argument("--loop", action="store_true",
+                            help="Keep running, scanning for upcoming exams every --interval seconds")
+        parser.add_argument("--interval", type=float, default=60.0, help="Seconds between scans with --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            exams = list(upcoming_exams(options["minutes"]))
+            built = sum(prewarm_exam(exam) for exam in exams)
+            if built or not options["loop"]:
+                self.stdout.write(f"Checked {len(exams)} upcoming exams, built {built} cache entries")
+
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from exam.gradebook import rebuild_gradebook
+from exam.models import Exam
+
+
+class Command(BaseCommand):
+    help = "Rebuild the SemesterGradebook rows from StudentExamSummary"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--department", type=int, help="only this department id")
+        parser.add_argument("--semester", type=int, help="only this semester")
+
+    def handle(self, *args, **options):
+        cohorts = Exam.objects.all()
+        if options["department"] is not None:
+            cohorts = cohorts.filter(department_id=options["department"])
+        if options["semester"] is not None:
+            cohorts = cohorts.filter(samester=options["semester"])
+        cohorts = cohorts.values_list("department_id", "samester").distinct().order_by("department_id", "samester")
+
+        for department_id, samester in cohorts:
+            count = rebuild_gradebook(department_id, samester)
+            self.stdout.write(f"department {department_id} semester {samester}: {count} students")
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(cohorts)} semester gradebooks"))
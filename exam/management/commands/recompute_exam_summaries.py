@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from exam.models import Exam
+from exam.summaries import recompute_exam_summaries
+
+
+class Command(BaseCommand):
+    help = "Rebuild every StudentExamSummary of an exam from its StudentExamResult rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument("exam_id", type=int)
+
+    def handle(self, *args, **options):
+        exam_id = options["exam_id"]
+        if not Exam.objects.filter(id=exam_id).exists():
+            raise CommandError(f"Exam {exam_id} does not exist")
+
+        count = recompute_exam_summaries(exam_id)
+        self.stdout.write(self.style.SUCCESS(f"Recomputed {count} summaries for exam {exam_id}"))
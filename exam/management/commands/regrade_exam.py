@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from exam.models import Exam
+from exam.regrade import regrade_questions
+
+
+class Command(BaseCommand):
+    help = "Regrade stored answers of an exam against its current answer key"
+
+    def add_arguments(self, parser):
+        parser.add_argument("exam_id", type=int)
+        parser.add_argument("--question", type=int, action="append", dest="questions",
+                            help="Only regrade this question (can be repeated)")
+
+    def handle(self, *args, **options):
+        try:
+            exam = Exam.objects.get(id=options["exam_id"])
+        except Exam.DoesNotExist:
+            raise CommandError(f"Exam {options['exam_id']} does not exist")
+
+        question_ids = options["questions"] or list(exam.question.values_list("id", flat=True))
+        regraded = regrade_questions(exam, question_ids)
+        self.stdout.write(self.style.SUCCESS(f"Regraded {regraded} answers of exam {exam.id}"))
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.20 on 2026-10-18 16:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("exam", "0008_notification"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="exam",
+            name="version",
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 4.2.20 on 2026-10-18 16:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("student", "0005_studentprofile_samester"),
+        ("exam", "0009_exam_version"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExamSubmission",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "receipt",
+                    models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+                ),
+                ("answers", models.JSONField(default=dict)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("processing", "Processing"),
+                            ("graded", "Graded"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=12,
+                    ),
+                ),
+                ("worker", models.CharField(blank=True, default="", max_length=64)),
+                ("claimed_at", models.DateTimeField(blank=True, null=True)),
+                ("total_marks", models.PositiveIntegerField(blank=True, null=True)),
+                ("error", models.TextField(blank=True, default="")),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("graded_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "exam",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="submissions",
+                        to="exam.exam",
+                    ),
+                ),
+                (
+                    "student",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="exam_submissions",
+                        to="student.studentprofile",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["status", "id"], name="exam_examsu_status_03007c_idx"
+                    )
+                ],
+            },
+        ),
+    ]
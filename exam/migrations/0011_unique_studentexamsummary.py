@@ -0,0 +1,34 @@
+# Generated by Django 4.2.20 on 2026-10-18 16:37
+
+from django.db import migrations
+from django.db.models import Count, Max
+
+
+def remove_duplicate_summaries(apps, schema_editor):
+    # keep the newest summary of every (student, exam) before adding the constraint
+    StudentExamSummary = apps.get_model("exam", "StudentExamSummary")
+    duplicates = (
+        StudentExamSummary.objects.values("student_id", "exam_id")
+        .annotate(count=Count("id"), keep=Max("id"))
+        .filter(count__gt=1)
+    )
+    for row in duplicates:
+        StudentExamSummary.objects.filter(
+            student_id=row["student_id"], exam_id=row["exam_id"]
+        ).exclude(id=row["keep"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("student", "0005_studentprofile_samester"),
+        ("exam", "0010_examsubmission"),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_summaries, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name="studentexamsummary",
+            unique_together={("student", "exam")},
+        ),
+    ]
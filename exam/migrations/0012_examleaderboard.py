@@ -0,0 +1,39 @@
+# Generated by Django 4.2.20 on 2026-10-18 16:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("exam", "0011_unique_studentexamsummary"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExamLeaderboard",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("tree", models.JSONField(default=list)),
+                ("students", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "exam",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="leaderboard",
+                        to="exam.exam",
+                    ),
+                ),
+            ],
+        ),
+    ]
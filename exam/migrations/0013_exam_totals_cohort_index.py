@@ -0,0 +1,47 @@
+# Generated by Django 4.2.20 on 2026-10-18 16:45
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_exam_totals(apps, schema_editor):
+    Exam = apps.get_model("exam", "Exam")
+    Question = apps.get_model("exam", "Question")
+    questions = Question.objects.filter(exam=OuterRef("pk")).order_by().values("exam")
+    Exam.objects.update(
+        question_count=Coalesce(
+            Subquery(questions.annotate(n=Count("id")).values("n")), 0
+        ),
+        total_marks=Coalesce(
+            Subquery(questions.annotate(n=Sum("marks")).values("n")), 0
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("exam", "0012_examleaderboard"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="exam",
+            name="question_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="exam",
+            name="total_marks",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="exam",
+            index=models.Index(
+                fields=["department", "samester", "start_time", "end_time"],
+                name="exam_cohort_window_idx",
+            ),
+        ),
+        migrations.RunPython(fill_exam_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.20 on 2026-10-18 16:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("student", "0005_studentprofile_samester"),
+        ("exam", "0013_exam_totals_cohort_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExamAttempt",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("started_at", models.DateTimeField()),
+                ("deadline", models.DateTimeField()),
+                ("submitted_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "exam",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="attempts",
+                        to="exam.exam",
+                    ),
+                ),
+                (
+                    "student",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="exam_attempts",
+                        to="student.studentprofile",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["submitted_at", "deadline"],
+                        name="exam_examat_submitt_7be80f_idx",
+                    )
+                ],
+                "unique_together": {("exam", "student")},
+            },
+        ),
+    ]
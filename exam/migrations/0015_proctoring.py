@@ -0,0 +1,108 @@
+# Generated by Django 4.2.20 on 2026-10-18 16:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("student", "0005_studentprofile_samester"),
+        ("exam", "0014_examattempt"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProctoringSummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("tab_hidden", models.PositiveIntegerField(default=0)),
+                ("window_blur", models.PositiveIntegerField(default=0)),
+                ("copy", models.PositiveIntegerField(default=0)),
+                ("paste", models.PositiveIntegerField(default=0)),
+                ("fullscreen_exit", models.PositiveIntegerField(default=0)),
+                ("total_events", models.PositiveIntegerField(default=0)),
+                ("last_event_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "exam",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="proctoring_summaries",
+                        to="exam.exam",
+                    ),
+                ),
+                (
+                    "student",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="proctoring_summaries",
+                        to="student.studentprofile",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("exam", "student")},
+            },
+        ),
+        migrations.CreateModel(
+            name="ProctoringEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("tab_hidden", "Tab hidden"),
+                            ("window_blur", "Window lost focus"),
+                            ("copy", "Copy"),
+                            ("paste", "Paste"),
+                            ("fullscreen_exit", "Left fullscreen"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("occurred_at", models.DateTimeField()),
+                ("received_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "exam",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="proctoring_events",
+                        to="exam.exam",
+                    ),
+                ),
+                (
+                    "student",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="proctoring_events",
+                        to="student.studentprofile",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["exam", "student", "occurred_at"],
+                        name="exam_procto_exam_id_dd2bc1_idx",
+                    )
+                ],
+            },
+        ),
+    ]
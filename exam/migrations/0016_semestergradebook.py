@@ -0,0 +1,85 @@
+# Generated by Django 4.2.20 on 2026-10-18 16:55
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+import django.db.models.deletion
+
+
+def fill_gradebooks(apps, schema_editor):
+    StudentExamSummary = apps.get_model("exam", "StudentExamSummary")
+    SemesterGradebook = apps.get_model("exam", "SemesterGradebook")
+    totals = (
+        StudentExamSummary.objects.values(
+            "student_id", "exam__department_id", "exam__samester"
+        )
+        .annotate(total_marks=Sum("total_marks"), exams_attempted=Count("id"))
+        .order_by()
+    )
+    SemesterGradebook.objects.bulk_create(
+        [
+            SemesterGradebook(
+                student_id=row["student_id"],
+                department_id=row["exam__department_id"],
+                samester=row["exam__samester"],
+                total_marks=row["total_marks"] or 0,
+                exams_attempted=row["exams_attempted"],
+            )
+            for row in totals
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("student", "0005_studentprofile_samester"),
+        ("users", "0002_department"),
+        ("exam", "0015_proctoring"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SemesterGradebook",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("samester", models.IntegerField()),
+                ("exams_attempted", models.PositiveIntegerField(default=0)),
+                ("total_marks", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "department",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="users.department",
+                    ),
+                ),
+                (
+                    "student",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="gradebooks",
+                        to="student.studentprofile",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["department", "samester"],
+                        name="exam_semest_departm_519377_idx",
+                    )
+                ],
+                "unique_together": {("student", "department", "samester")},
+            },
+        ),
+        migrations.RunPython(fill_gradebooks, migrations.RunPython.noop),
+    ]
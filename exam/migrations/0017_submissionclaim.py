@@ -0,0 +1,51 @@
+# Generated by Django 4.2.20 on 2026-10-18 17:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("student", "0005_studentprofile_samester"),
+        ("exam", "0016_semestergradebook"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SubmissionClaim",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.CharField(max_length=64)),
+                ("outcome", models.JSONField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "exam",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="submission_claims",
+                        to="exam.exam",
+                    ),
+                ),
+                (
+                    "student",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="submission_claims",
+                        to="student.studentprofile",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("exam", "student", "key")},
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations
+from django.db.models import Count
+
+
+def fill_leaderboards(apps, schema_editor):
+    # boards for exams graded before leaderboards existed, same layout as
+    # exam.leaderboard.FenwickTree.from_counts (tree[i] covers score i - 1)
+    StudentExamSummary = apps.get_model("exam", "StudentExamSummary")
+    ExamLeaderboard = apps.get_model("exam", "ExamLeaderboard")
+
+    counts = {}
+    rows = (
+        StudentExamSummary.objects.exclude(exam__leaderboard__isnull=False)
+        .values("exam_id", "total_marks")
+        .annotate(students=Count("id"))
+        .order_by()
+    )
+    for row in rows:
+        counts.setdefault(row["exam_id"], {})[row["total_marks"]] = row["students"]
+
+    boards = []
+    for exam_id, scores in counts.items():
+        tree = [0] + [scores.get(score, 0) for score in range(max(scores) + 1)]
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        boards.append(
+            ExamLeaderboard(exam_id=exam_id, tree=tree, students=sum(scores.values()))
+        )
+    ExamLeaderboard.objects.bulk_create(boards, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("exam", "0017_submissionclaim"),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_leaderboards, migrations.RunPython.noop),
+    ]
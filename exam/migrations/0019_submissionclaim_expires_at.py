@@ -0,0 +1,27 @@
+# Generated by Django 4.2.20 on 2026-10-18 18:40
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("exam", "0018_backfill_leaderboards"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="submissionclaim",
+            name="expires_at",
+            # claims from before the field are expired, the next cleanup deletes them
+            field=models.DateTimeField(default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name="submissionclaim",
+            index=models.Index(
+                fields=["expires_at"], name="exam_submis_expires_c495a5_idx"
+            ),
+        ),
+    ]
@@ -1,8 +1,11 @@
+import uuid
+
 from django.db import models
 from faculty.models import TeacherProfile
 from users.models import Department   #department Only
 from student.models import StudentProfile
-from django.db.models import Sum
+from django.db.models import Sum, Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 
 
 
@@ -24,9 +27,75 @@ class Exam(models.Model):
     duration_miniutes = models.PositiveIntegerField(help_text="Exam Duration in Miniutes")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # bumped every time questions/options change, cached answer keys are keyed on it
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    # denormalized from the questions, refreshed together with the version
+    question_count = models.PositiveIntegerField(default=0, editable=False)
+    total_marks = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        # students look up the exams open right now for their department and samester
+        indexes = [
+            models.Index(
+                fields=['department', 'samester', 'start_time', 'end_time'],
+                name='exam_cohort_window_idx',
+            ),
+        ]
+
     def __str__(self):
         return f"{self.title}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # the cohort as loaded, so save() can tell when the exam moved to another one
+        instance._loaded_cohort = (instance.__dict__.get('department_id'), instance.__dict__.get('samester'))
+        return instance
+
+    # written only by bump_version(), a save of a stale instance must not put back an old version
+    DENORMALIZED_FIELDS = ('version', 'question_count', 'total_marks')
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not args and kwargs.get('update_fields') is None:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.DENORMALIZED_FIELDS
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+        from .schedule import invalidate_schedule
+        invalidate_schedule(self.department_id, self.samester)
+        # moved: the old cohort's cached schedule still lists the exam, and the
+        # exam's marks count in the wrong semester gradebook
+        previous = getattr(self, '_loaded_cohort', None)
+        if previous and None not in previous and previous != (self.department_id, int(self.samester)):
+            from .gradebook import rebuild_gradebook
+            invalidate_schedule(*previous)
+            rebuild_gradebook(*previous)
+            rebuild_gradebook(self.department_id, int(self.samester))
+        self._loaded_cohort = (self.department_id, int(self.samester))
+
+    def delete(self, *args, **kwargs):
+        from .gradebook import rebuild_gradebook
+        from .schedule import invalidate_schedule
+        invalidate_schedule(self.department_id, self.samester)
+        deleted = super().delete(*args, **kwargs)
+        # the exam's summaries are gone, its marks must leave the semester totals too
+        rebuild_gradebook(self.department_id, int(self.samester))
+        return deleted
+
+    def bump_version(self):
+        # one UPDATE: new version plus question count / total marks recounted
+        questions = Question.objects.filter(exam=OuterRef('pk')).order_by().values('exam')
+        Exam.objects.filter(pk=self.pk).update(
+            version=F('version') + 1,
+            question_count=Coalesce(Subquery(questions.annotate(n=Count('id')).values('n')), 0),
+            total_marks=Coalesce(Subquery(questions.annotate(n=Sum('marks')).values('n')), 0),
+        )
+        self.refresh_from_db(fields=['version', 'question_count', 'total_marks'])
+
 
 class Question(models.Model):
     exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name="question")
@@ -85,19 +154,194 @@ class StudentExamSummary(models.Model):
         return f"{self.student} - {self.exam}"
 
     def calculate_summary(self):
-        # Automatically calculate the number of correct answers and total marks
-        correct_answers = self.exam_results.filter(is_correct=True).count()
-        total_marks = self.exam_results.filter(is_correct=True).aggregate(Sum('mark_obtains'))['mark_obtains__sum'] or 0
-        self.total_questions = self.exam_results.count()
-        self.total_marks = total_marks
+        # Recalculate totals from this student's answers in one aggregate query
+        totals = StudentExamResult.objects.filter(student_id=self.student_id, exam_id=self.exam_id).aggregate(
+            total_marks=Sum('mark_obtains'),
+            total_questions=Count('id'),
+        )
+        self.total_questions = totals['total_questions']
+        self.total_marks = totals['total_marks'] or 0
         self.save()
 
     class Meta:
         verbose_name = 'Student Exam Summary'
         verbose_name_plural = 'Student Exam Summaries'
+        # one summary per attempt, grading upserts on it
+        unique_together = ('student', 'exam')
+
+
+
+class SemesterGradebook(models.Model):
+    '''A student's totals over every exam of one (department, samester).
+
+        The per-exam cells are the StudentExamSummary rows; grading moves this
+        row by the change in the exam total, exam/gradebook.py rebuilds it.
+    '''
+    student = models.ForeignKey(StudentProfile, on_delete=models.CASCADE, related_name="gradebooks")
+    department = models.ForeignKey(Department, on_delete=models.CASCADE)
+    samester = models.IntegerField()
+    exams_attempted = models.PositiveIntegerField(default=0)
+    total_marks = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        unique_together = ('student', 'department', 'samester')
+        indexes = [
+            models.Index(fields=['department', 'samester']),
+        ]
+
+    def __str__(self):
+        return f"{self.student} | Samester {self.samester} | {self.total_marks}"
+
+
+class ExamLeaderboard(models.Model):
+    '''Score distribution of an exam kept as a Fenwick tree over integer marks.
+
+        tree[i] holds the Fenwick partial count for score i - 1, see exam/leaderboard.py.
+    '''
+    exam = models.OneToOneField(Exam, on_delete=models.CASCADE, related_name="leaderboard")
+    tree = models.JSONField(default=list)
+    students = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Leaderboard | {self.exam}"
 
 
+SUBMISSION_STATUS_CHOICES = [
+    ('pending', 'Pending'),
+    ('processing', 'Processing'),
+    ('graded', 'Graded'),
+    ('failed', 'Failed'),
+]
+
+class ExamSubmission(models.Model):
+    '''A submitted paper waiting in the grading queue.
+
+        start_exam stores the answers here and returns the receipt at once,
+        the grade_submissions command drains the queue into StudentExamResult.
+    '''
+    receipt = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name="submissions")
+    student = models.ForeignKey(StudentProfile, on_delete=models.CASCADE, related_name="exam_submissions")
+
+    # question id -> selected option id, as posted
+    answers = models.JSONField(default=dict)
+
+    status = models.CharField(max_length=12, choices=SUBMISSION_STATUS_CHOICES, default='pending')
+    worker = models.CharField(max_length=64, blank=True, default='')
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    total_marks = models.PositiveIntegerField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    graded_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # workers pick the oldest pending submissions
+            models.Index(fields=['status', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.student} | {self.exam} | {self.status}"
+
+
+class ExamAttempt(models.Model):
+    '''When a student opened an exam and until when they may submit.
+
+        Written once when the paper is first opened, checks go through the
+        cached copy in exam/attempts.py.
+    '''
+    exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name="attempts")
+    student = models.ForeignKey(StudentProfile, on_delete=models.CASCADE, related_name="exam_attempts")
+    started_at = models.DateTimeField()
+    # started_at + duration, but never after the exam closes
+    deadline = models.DateTimeField()
+    submitted_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('exam', 'student')
+        indexes = [
+            # attempts that ran out without a submit
+            models.Index(fields=['submitted_at', 'deadline']),
+        ]
+
+    def __str__(self):
+        return f"{self.student} | {self.exam} | until {self.deadline}"
+
+
+class SubmissionClaim(models.Model):
+    '''The first POST of a rendered paper, keyed by its submission key.
+
+        The insert is the claim: the unique constraint lets exactly one request
+        through, repeats read the stored outcome (null while still running).
+        Claims are only kept until expires_at, close_expired_attempts deletes them.
+    '''
+    exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name="submission_claims")
+    student = models.ForeignKey(StudentProfile, on_delete=models.CASCADE, related_name="submission_claims")
+    key = models.CharField(max_length=64)
+    # {'level', 'message', 'url'} shown to the student
+    outcome = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('exam', 'student', 'key')
+        indexes = [
+            models.Index(fields=['expires_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.student} | {self.exam} | {self.key}"
+
+
+
+PROCTORING_EVENT_CHOICES = [
+    ('tab_hidden', 'Tab hidden'),
+    ('window_blur', 'Window lost focus'),
+    ('copy', 'Copy'),
+    ('paste', 'Paste'),
+    ('fullscreen_exit', 'Left fullscreen'),
+]
+
+class ProctoringEvent(models.Model):
+    # raw integrity events from the exam page, appended in batches by exam/proctoring.py
+    exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name="proctoring_events")
+    student = models.ForeignKey(StudentProfile, on_delete=models.CASCADE, related_name="proctoring_events")
+    kind = models.CharField(max_length=20, choices=PROCTORING_EVENT_CHOICES)
+    occurred_at = models.DateTimeField()
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['exam', 'student', 'occurred_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.student} | {self.exam} | {self.kind}"
+
+
+class ProctoringSummary(models.Model):
+    '''Event counts of one attempt, moved forward on every flush.
+
+        Results pages read this row, never the raw events.
+    '''
+    exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name="proctoring_summaries")
+    student = models.ForeignKey(StudentProfile, on_delete=models.CASCADE, related_name="proctoring_summaries")
+    tab_hidden = models.PositiveIntegerField(default=0)
+    window_blur = models.PositiveIntegerField(default=0)
+    copy = models.PositiveIntegerField(default=0)
+    paste = models.PositiveIntegerField(default=0)
+    fullscreen_exit = models.PositiveIntegerField(default=0)
+    total_events = models.PositiveIntegerField(default=0)
+    last_event_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('exam', 'student')
+
+    def __str__(self):
+        return f"{self.student} | {self.exam} | {self.total_events} events"
+
 # ##################################################
 ##################################################
 TARGET_CHOICES = [
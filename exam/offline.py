@@ -0,0 +1,144 @@
+# exam/offline.py
+
+import gzip
+import hashlib
+import hmac
+import json
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+
+from .attempts import GRACE_SECONDS
+from .models import Exam, Question
+
+
+'''Offline exam bundle
+
+    For halls with bad connectivity the whole attempt is two requests:
+
+    1. GET the bundle: the paper as compact JSON, gzip-compressed, without the
+       correct answers. The compressed bytes are built once per (exam id, exam
+       version) and cached, every student gets the same bytes. The response
+       also carries an attempt token (exam, student, version, signed by the
+       server) and a checksum key derived from it. Integrity of the paper
+       itself is left to TLS.
+
+    2. POST the answers once at the end as a JSON string plus
+       HMAC-SHA256(checksum key, that string). The server checks the token,
+       re-derives the key, checks the checksum and grades the paper in one batch.
+
+    The checksum is a transport check only: it catches answers truncated or
+    mangled on a flaky link, but whoever holds the token also holds the key
+    and can checksum any answers. What the server does vouch for is the token:
+    the exam, the student, the exam version and when it was issued. A token
+    for an older version of the exam is refused, its question and option ids
+    may no longer mean the same thing.
+
+    A hall may reconnect up to RECONNECT_SECONDS after the attempt's deadline
+    (plus the usual grace) and its answers still count. The token lives exactly
+    as long, so both checks use the same window.
+'''
+
+BUNDLE_TIMEOUT = 60 * 60 * 24
+TOKEN_SALT = 'exam.offline.attempt'
+CHECKSUM_SALT = 'exam.offline.answers'
+RECONNECT_SECONDS = getattr(settings, 'EXAM_OFFLINE_RECONNECT_SECONDS', 300)
+
+
+class OfflineSubmissionError(Exception):
+    pass
+
+
+def bundle_cache_key(exam_id, version):
+    return f"exam:bundle:{exam_id}:{version}"
+
+
+def build_bundle(exam_id, version):
+    exam = Exam.objects.only('title', 'duration_miniutes').get(id=exam_id)
+    questions = Question.objects.filter(exam_id=exam_id).order_by('id').prefetch_related('Options')
+    paper = {
+        'exam': exam_id,
+        'version': version,
+        'title': exam.title,
+        'duration_minutes': exam.duration_miniutes,
+        # is_correct is left out on purpose
+        'questions': [
+            {
+                'id': question.id,
+                'text': question.text,
+                'marks': question.marks,
+                'options': [{'id': option.id, 'text': option.text} for option in question.Options.all()],
+            }
+            for question in questions
+        ],
+    }
+    return gzip.compress(json.dumps(paper, separators=(',', ':')).encode(), mtime=0)
+
+
+@lru_cache(maxsize=64)
+def _load_bundle(exam_id, version):
+    key = bundle_cache_key(exam_id, version)
+    bundle = cache.get(key)
+    if bundle is None:
+        bundle = build_bundle(exam_id, version)
+        cache.set(key, bundle, BUNDLE_TIMEOUT)
+    return bundle
+
+
+def get_bundle(exam):
+    '''gzip bytes of the exam's current version.'''
+    return _load_bundle(exam.id, exam.version)
+
+
+def token_max_age(exam):
+    # a token is handed out at the latest when the attempt starts
+    return exam.duration_miniutes * 60 + GRACE_SECONDS + RECONNECT_SECONDS
+
+
+def is_late(attempt, now=None):
+    '''Past the deadline, the grace period and the reconnect window.'''
+    now = now or timezone.now()
+    return now > attempt.deadline + timedelta(seconds=GRACE_SECONDS + RECONNECT_SECONDS)
+
+
+def attempt_token(exam, student):
+    return signing.dumps({'exam': exam.id, 'student': student.id, 'version': exam.version}, salt=TOKEN_SALT)
+
+
+def checksum_key_for(token):
+    # handed to the client with the token, see the module docstring for what this proves
+    return salted_hmac(CHECKSUM_SALT, token, algorithm='sha256').hexdigest()
+
+
+def read_submission(exam, student, token, answers_json, checksum, max_age):
+    '''Verify a posted offline submission, returns {question id: option id}.
+
+        Raises OfflineSubmissionError when the token or the checksum doesn't check
+        out, or the exam has changed since the token was issued.
+    '''
+    if not isinstance(token, str) or not isinstance(answers_json, str) or not isinstance(checksum, str):
+        raise OfflineSubmissionError("token, answers and checksum must be strings")
+
+    try:
+        claims = signing.loads(token, salt=TOKEN_SALT, max_age=max_age)
+    except signing.BadSignature:
+        raise OfflineSubmissionError("attempt token is invalid or expired")
+    if claims.get('exam') != exam.id or claims.get('student') != student.id:
+        raise OfflineSubmissionError("attempt token belongs to another attempt")
+    if claims.get('version') != exam.version:
+        raise OfflineSubmissionError("the exam was changed after the bundle was downloaded")
+
+    expected = hmac.new(checksum_key_for(token).encode(), answers_json.encode(), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(expected, checksum):
+        raise OfflineSubmissionError("answer checksum does not match")
+
+    try:
+        answers = json.loads(answers_json)
+        return {int(question_id): option_id for question_id, option_id in answers.items()}
+    except (ValueError, AttributeError, TypeError):
+        raise OfflineSubmissionError("answers are not a JSON object of question id -> option id")
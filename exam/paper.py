@@ -0,0 +1,111 @@
+# exam/paper.py
+
+import hashlib
+import random
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .models import Question
+
+
+'''Pre-rendered exam paper
+
+    The question/options part of student_start_exam.html is the same for every
+    student, so it is rendered once per (exam id, exam version) and cached as a
+    list of blocks:
+
+        (question id, html before the options, [(option id, option html)], html after)
+
+    The view wraps the blocks in the per-student shell (csrf token, timer).
+    Exam.bump_version() invalidates it.
+
+    With settings.EXAM_SHUFFLE_PAPERS every student gets questions and options in
+    their own order: a permutation seeded from (exam id, student id, exam version)
+    is applied while joining the cached blocks, so nothing is stored per student.
+    Grading is unaffected because answers are posted as option ids.
+
+    In paged mode (settings.EXAM_PAGE_SIZE) the student's order is sliced and
+    only one page of blocks is joined per request.
+'''
+
+PAPER_TIMEOUT = 60 * 60 * 24
+OPTIONS_MARKER = '<!--options-->'
+
+
+def paper_cache_key(exam_id, version):
+    return f"exam:paper:{exam_id}:{version}"
+
+
+def render_paper(exam_id):
+    questions = Question.objects.filter(exam_id=exam_id).order_by('id').prefetch_related('Options')
+    paper = []
+    for question in questions:
+        html = render_to_string("student/student_exam_question.html", {
+            'question': question,
+            'options': mark_safe(OPTIONS_MARKER),
+        })
+        head, tail = html.split(OPTIONS_MARKER)
+        options = [
+            (option.id, render_to_string("student/student_exam_option.html", {'option': option}))
+            for option in question.Options.all()
+        ]
+        paper.append((question.id, head, options, tail))
+    return paper
+
+
+@lru_cache(maxsize=64)
+def _load_paper(exam_id, version):
+    key = paper_cache_key(exam_id, version)
+    paper = cache.get(key)
+    if paper is None:
+        paper = render_paper(exam_id)
+        cache.set(key, paper, PAPER_TIMEOUT)
+    return paper
+
+
+def get_paper(exam):
+    return _load_paper(exam.id, exam.version)
+
+
+def student_rng(exam, student):
+    seed = hashlib.sha256(f"{exam.id}:{student.id}:{exam.version}".encode()).digest()
+    return random.Random(int.from_bytes(seed[:8], 'big'))
+
+
+def paper_order(exam, student=None):
+    '''The cached blocks in the order this student sees them, options included.'''
+    paper = get_paper(exam)
+    if student is None or not settings.EXAM_SHUFFLE_PAPERS:
+        return paper
+
+    rng = student_rng(exam, student)
+    ordered = []
+    for question_id, head, options, tail in rng.sample(paper, len(paper)):
+        ordered.append((question_id, head, rng.sample(options, len(options)), tail))
+    return ordered
+
+
+def _join(blocks):
+    return [
+        mark_safe(head + ''.join(option_html for _, option_html in options) + tail)
+        for _, head, options, tail in blocks
+    ]
+
+
+def paper_blocks(exam, student=None):
+    # html of every question, ready to drop into the page
+    return _join(paper_order(exam, student))
+
+
+def page_count(exam, page_size):
+    return max(1, -(-len(get_paper(exam)) // page_size))
+
+
+def paper_page(exam, student, page, page_size):
+    '''html of the questions on `page` (0-based) of this student's paper, only that slice is joined.'''
+    start = page * page_size
+    return _join(paper_order(exam, student)[start:start + page_size])
@@ -0,0 +1,213 @@
+# exam/paper_editor.py
+
+from django.db import transaction
+
+from .models import Option, Question, StudentExamResult, StudentExamSummary
+from .regrade import regrade_questions
+from .summaries import recompute_exam_summaries
+
+
+'''Whole-exam batch save for the exam editor
+
+    The editor posts every question of the exam at once:
+
+        {"questions": [{"id": 12, "text": "...", "marks": 2,
+                        "options": [{"id": 40, "text": "...", "is_correct": true}, ...]},
+                       {"id": null, ...}]}
+
+    The payload is diffed against the database and only changed rows are
+    written with bulk_update / bulk_create / one DELETE per model, in a single
+    transaction. Questions missing from the payload are deleted, ids of null
+    are created. The exam version is bumped once at the end.
+
+    An option some student has chosen is never deleted: its stored answers
+    would go with it (StudentExamResult.selected_option cascades), so the save
+    is refused instead. A payload of the wrong shape is refused the same way.
+'''
+
+
+class PaperEditError(Exception):
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("; ".join(errors))
+
+
+def _clean_id(value):
+    # an existing row's id, None for a new row
+    if value is None or (isinstance(value, int) and not isinstance(value, bool)):
+        return value
+    raise ValueError
+
+
+def _clean_question(number, data):
+    if not isinstance(data, dict):
+        return None, '', None, [], [f"Question {number}: not a question"]
+
+    errors = []
+    try:
+        question_id = _clean_id(data.get('id'))
+    except ValueError:
+        errors.append(f"Question {number}: id must be a whole number")
+        question_id = None
+    text = str(data.get('text') or '').strip()
+    if not text:
+        errors.append(f"Question {number}: text is empty")
+    try:
+        marks = int(data.get('marks'))
+        if marks < 1:
+            raise ValueError
+    except (TypeError, ValueError):
+        errors.append(f"Question {number}: marks must be a whole number of at least 1")
+        marks = None
+
+    options = []
+    options_data = data.get('options') or []
+    if not isinstance(options_data, list):
+        errors.append(f"Question {number}: options must be a list")
+        options_data = []
+    for option in options_data:
+        if not isinstance(option, dict):
+            errors.append(f"Question {number}: not an option")
+            continue
+        try:
+            option_id = _clean_id(option.get('id'))
+        except ValueError:
+            errors.append(f"Question {number}: option id must be a whole number")
+            continue
+        option_text = str(option.get('text') or '').strip()
+        if not option_text:
+            errors.append(f"Question {number}: option text is empty")
+        options.append((option_id, option_text, bool(option.get('is_correct'))))
+    if len(options) < 2:
+        errors.append(f"Question {number}: at least two options are required")
+    if sum(is_correct for _, _, is_correct in options) != 1:
+        errors.append(f"Question {number}: select exactly one correct option")
+
+    return question_id, text, marks, options, errors
+
+
+def save_paper(exam, questions_data):
+    '''Apply the editor payload to `exam`, returns counts of created/updated/deleted rows.
+
+        Raises PaperEditError and writes nothing when the payload is invalid
+        or would delete an option students have chosen.
+    '''
+    if not isinstance(questions_data, list):
+        raise PaperEditError(["questions must be a list"])
+
+    current_questions = {
+        question_id: (text, marks)
+        for question_id, text, marks in Question.objects.filter(exam=exam).values_list('id', 'text', 'marks')
+    }
+    current_options = {
+        option_id: (question_id, text, is_correct)
+        for option_id, question_id, text, is_correct in Option.objects.filter(question__exam=exam).values_list(
+            'id', 'question_id', 'text', 'is_correct'
+        )
+    }
+
+    cleaned = []
+    errors = []
+    for number, data in enumerate(questions_data, start=1):
+        question_id, text, marks, options, question_errors = _clean_question(number, data)
+        errors.extend(question_errors)
+        if question_id is not None and question_id not in current_questions:
+            errors.append(f"Question {number}: does not belong to this exam")
+        for option_id, _, _ in options:
+            if option_id is not None and current_options.get(option_id, (None,))[0] != question_id:
+                errors.append(f"Question {number}: option does not belong to this question")
+        cleaned.append((question_id, text, marks, options))
+    if errors:
+        raise PaperEditError(errors)
+
+    numbers = {question_id: number for number, (question_id, _, _, _) in enumerate(cleaned, start=1)}
+    questions_to_update = []
+    questions_to_create = []
+    options_to_update = []
+    new_options = []
+    kept_questions = set()
+    kept_options = set()
+    key_changed = []
+
+    for question_id, text, marks, options in cleaned:
+        if question_id is None:
+            question = Question(exam=exam, text=text, marks=marks)
+            questions_to_create.append(question)
+            new_options.extend((question, option) for option in options)
+            continue
+
+        kept_questions.add(question_id)
+        old_text, old_marks = current_questions[question_id]
+        if (text, marks) != (old_text, old_marks):
+            questions_to_update.append(Question(id=question_id, exam=exam, text=text, marks=marks))
+
+        old_correct = {option_id for option_id, (q_id, _, is_correct) in current_options.items()
+                       if q_id == question_id and is_correct}
+        new_correct = {option_id for option_id, _, is_correct in options if is_correct}
+        if marks != old_marks or old_correct != new_correct:
+            key_changed.append(question_id)
+
+        for option_id, option_text, is_correct in options:
+            if option_id is None:
+                new_options.append((question_id, (option_id, option_text, is_correct)))
+                continue
+            kept_options.add(option_id)
+            if current_options[option_id][1:] != (option_text, is_correct):
+                options_to_update.append(Option(id=option_id, question_id=question_id,
+                                                text=option_text, is_correct=is_correct))
+
+    deleted_questions = set(current_questions) - kept_questions
+    deleted_options = {
+        option_id for option_id, (question_id, _, _) in current_options.items()
+        if question_id in kept_questions and option_id not in kept_options
+    }
+
+    chosen = set(
+        StudentExamResult.objects.filter(selected_option_id__in=deleted_options)
+        .values_list('selected_option_id', flat=True).distinct()
+    ) if deleted_options else set()
+    if chosen:
+        raise PaperEditError([
+            f'Question {numbers[current_options[option_id][0]]}: option "{current_options[option_id][1]}" '
+            f'was chosen by students and can not be removed'
+            for option_id in sorted(chosen)
+        ])
+
+    with transaction.atomic():
+        if deleted_questions:
+            Question.objects.filter(id__in=deleted_questions).delete()
+        if deleted_options:
+            Option.objects.filter(id__in=deleted_options).delete()
+        if questions_to_update:
+            Question.objects.bulk_update(questions_to_update, ['text', 'marks'])
+        if questions_to_create:
+            Question.objects.bulk_create(questions_to_create)
+        if options_to_update:
+            Option.objects.bulk_update(options_to_update, ['text', 'is_correct'])
+        if new_options:
+            Option.objects.bulk_create([
+                Option(
+                    question_id=question if isinstance(question, int) else question.id,
+                    text=option_text,
+                    is_correct=is_correct,
+                )
+                for question, (_, option_text, is_correct) in new_options
+            ])
+
+        changes = {
+            'created': len(questions_to_create) + len(new_options),
+            'updated': len(questions_to_update) + len(options_to_update),
+            'deleted': len(deleted_questions) + len(deleted_options),
+        }
+        if not any(changes.values()):
+            return changes
+
+        exam.bump_version()
+
+        # keep stored answers and totals in step with the new key
+        if key_changed:
+            regrade_questions(exam, key_changed)
+        if (deleted_questions or deleted_options) and StudentExamSummary.objects.filter(exam=exam).exists():
+            recompute_exam_summaries(exam.id)
+
+    return changes
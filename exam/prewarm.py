@@ -0,0 +1,48 @@
+# exam/prewarm.py
+
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .answer_key import ANSWER_KEY_TIMEOUT, answer_key_cache_key, compile_answer_key
+from .models import Exam
+from .offline import BUNDLE_TIMEOUT, build_bundle, bundle_cache_key
+from .paper import PAPER_TIMEOUT, paper_cache_key, render_paper
+from .schedule import SCHEDULE_TIMEOUT, load_schedule, schedule_cache_key
+
+
+'''Cache pre-warming ahead of exam start
+
+    Everything the first wave of students needs at start_time is built a few
+    minutes early straight into the shared cache: the rendered paper, compiled
+    answer key and offline bundle of the current exam version, and the cohort
+    schedule behind the available exams page. The in-process lru caches are
+    skipped on purpose, the point is to fill the cache every web worker reads.
+'''
+
+
+def _warm(key, build, timeout):
+    # True when the entry had to be built
+    if cache.get(key) is not None:
+        return False
+    cache.set(key, build(), timeout)
+    return True
+
+
+def upcoming_exams(minutes):
+    # starting within the next `minutes`, or already running
+    now = timezone.now()
+    return Exam.objects.filter(start_time__lte=now + timedelta(minutes=minutes), end_time__gte=now)
+
+
+def prewarm_exam(exam):
+    '''Build the missing cache entries of one exam, returns how many were built.'''
+    built = _warm(paper_cache_key(exam.id, exam.version), lambda: render_paper(exam.id), PAPER_TIMEOUT)
+    built += _warm(answer_key_cache_key(exam.id, exam.version), lambda: compile_answer_key(exam.id),
+                   ANSWER_KEY_TIMEOUT)
+    built += _warm(bundle_cache_key(exam.id, exam.version), lambda: build_bundle(exam.id, exam.version),
+                   BUNDLE_TIMEOUT)
+    built += _warm(schedule_cache_key(exam.department_id, exam.samester),
+                   lambda: load_schedule(exam.department_id, exam.samester), SCHEDULE_TIMEOUT)
+    return built
@@ -0,0 +1,118 @@
+# exam/proctoring.py
+
+import time
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import PROCTORING_EVENT_CHOICES, ProctoringEvent, ProctoringSummary
+
+
+'''Proctoring event ingestion
+
+    The exam page posts its integrity events (tab hidden, blur, copy, paste,
+    fullscreen exit) in batches. Like answer autosave they are buffered per
+    (exam, student) in the cache and appended with one bulk_create once the
+    buffer holds FLUSH_EVENTS events or is FLUSH_SECONDS old. The same flush
+    moves the attempt's ProctoringSummary counters forward with one UPDATE,
+    so results pages read one row per attempt and never the raw events.
+'''
+
+FLUSH_SECONDS = getattr(settings, 'EXAM_PROCTORING_FLUSH_SECONDS', 30)
+FLUSH_EVENTS = getattr(settings, 'EXAM_PROCTORING_FLUSH_EVENTS', 50)
+MAX_BATCH = 200
+BUFFER_TIMEOUT = 60 * 60 * 6
+
+EVENT_KINDS = {kind for kind, _ in PROCTORING_EVENT_CHOICES}
+
+
+def events_cache_key(exam_id, student_id):
+    return f"exam:proctoring:{exam_id}:{student_id}"
+
+
+def clean_events(events, started_at, now=None):
+    '''[(kind, occurred_at)] from the posted batch, unknown kinds dropped.
+
+        Client clocks can't be trusted, times are clamped into the attempt.
+    '''
+    now = now or timezone.now()
+    cleaned = []
+    for event in events[:MAX_BATCH]:
+        if not isinstance(event, dict) or event.get('type') not in EVENT_KINDS:
+            continue
+        try:
+            occurred_at = datetime.fromtimestamp(float(event.get('at')) / 1000, dt_timezone.utc)
+        except (TypeError, ValueError, OverflowError, OSError):
+            occurred_at = now
+        cleaned.append((event['type'], min(max(occurred_at, started_at), now)))
+    return cleaned
+
+
+def record_events(exam, student, events):
+    '''Buffer [(kind, occurred_at)], flushing when due. Returns (events still buffered, events written).'''
+    key = events_cache_key(exam.id, student.id)
+    buffer = cache.get(key) or {'events': [], 'since': time.time()}
+    buffer['events'].extend((kind, occurred_at.timestamp()) for kind, occurred_at in events)
+
+    pending = buffer['events']
+    if len(pending) >= FLUSH_EVENTS or time.time() - buffer['since'] >= FLUSH_SECONDS:
+        cache.delete(key)
+        return 0, write_events(exam, student, pending)
+
+    cache.set(key, buffer, BUFFER_TIMEOUT)
+    return len(pending), 0
+
+
+def flush_events(exam, student):
+    # end of the attempt: write whatever is still buffered
+    key = events_cache_key(exam.id, student.id)
+    buffer = cache.get(key)
+    if buffer is None:
+        return 0
+    cache.delete(key)
+    return write_events(exam, student, buffer['events'])
+
+
+def write_events(exam, student, events):
+    if not events:
+        return 0
+
+    rows = [
+        ProctoringEvent(exam_id=exam.id, student_id=student.id, kind=kind,
+                        occurred_at=datetime.fromtimestamp(occurred_at, dt_timezone.utc))
+        for kind, occurred_at in events
+    ]
+    counts = Counter(kind for kind, _ in events)
+    last_event_at = max(row.occurred_at for row in rows)
+
+    with transaction.atomic():
+        ProctoringEvent.objects.bulk_create(rows)
+        _add_to_summary(exam, student, counts, last_event_at)
+    return len(rows)
+
+
+def _add_to_summary(exam, student, counts, last_event_at):
+    increments = {kind: F(kind) + count for kind, count in counts.items()}
+    updated = ProctoringSummary.objects.filter(exam_id=exam.id, student_id=student.id).update(
+        total_events=F('total_events') + sum(counts.values()),
+        last_event_at=Greatest(Coalesce(F('last_event_at'), Value(last_event_at)), Value(last_event_at)),
+        **increments,
+    )
+    if updated:
+        return
+
+    try:
+        with transaction.atomic():
+            ProctoringSummary.objects.create(
+                exam_id=exam.id, student_id=student.id,
+                total_events=sum(counts.values()), last_event_at=last_event_at, **counts,
+            )
+    except IntegrityError:
+        # another flush created the row first
+        _add_to_summary(exam, student, counts, last_event_at)
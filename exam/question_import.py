@@ -0,0 +1,172 @@
+# exam/question_import.py
+
+import csv
+import io
+import json
+
+from django.db import transaction
+
+from .models import Option, Question
+
+
+'''Bulk question bank import
+
+    CSV, one question per row (header optional):
+
+        question,marks,correct,option 1,option 2,option 3,...
+
+    JSON Lines, one object per line:
+
+        {"question": "...", "marks": 2, "correct": 1, "options": ["...", "..."]}
+
+    `correct` is the 1-based number of the correct option. The file is parsed as
+    a stream and inserted with bulk_create in chunks, so memory stays bounded.
+    Everything runs in one transaction: one bad line and nothing is imported.
+'''
+
+CHUNK_SIZE = 500
+MAX_ERRORS = 20
+
+
+class QuestionImportError(Exception):
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("; ".join(errors))
+
+
+def _text_stream(file):
+    # uploaded files and files opened in binary mode both come in as bytes
+    if isinstance(file, io.TextIOBase):
+        return file
+    return io.TextIOWrapper(getattr(file, 'file', file), encoding='utf-8-sig', newline='')
+
+
+def _csv_records(stream):
+    reader = csv.reader(stream)
+    for row in reader:
+        line_number = reader.line_num
+        if not row or not any(cell.strip() for cell in row):
+            continue
+        if reader.line_num == 1 and row[0].strip().lower() == 'question':
+            continue   # header
+        if len(row) < 3:
+            yield line_number, ValueError("expected question,marks,correct,options...")
+            continue
+        yield line_number, {
+            'question': row[0],
+            'marks': row[1],
+            'correct': row[2],
+            'options': [cell for cell in row[3:] if cell.strip()],
+        }
+
+
+def _jsonl_records(stream):
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as e:
+            yield line_number, e
+
+
+def _clean(record):
+    if isinstance(record, Exception):
+        raise ValueError(str(record))
+    if not isinstance(record, dict):
+        raise ValueError("expected an object")
+
+    text = str(record.get('question') or '').strip()
+    if not text:
+        raise ValueError("question text is empty")
+
+    try:
+        marks = int(record.get('marks', 1))
+        correct = int(record.get('correct'))
+    except (TypeError, ValueError):
+        raise ValueError("marks and correct must be whole numbers")
+    if marks < 1:
+        raise ValueError("marks must be at least 1")
+
+    options = record.get('options') or []
+    # a string would be split into one option per character
+    if not isinstance(options, list) or not all(
+        isinstance(option, (str, int, float)) and not isinstance(option, bool) for option in options
+    ):
+        raise ValueError("options must be a list of texts")
+    options = [str(option).strip() for option in options]
+    if len(options) < 2 or not all(options):
+        raise ValueError("at least two non-empty options are required")
+    if not 1 <= correct <= len(options):
+        raise ValueError(f"correct must be between 1 and {len(options)}")
+    if any(len(option) > Option._meta.get_field('text').max_length for option in options):
+        raise ValueError("option text is too long")
+
+    return text, marks, options, correct - 1
+
+
+def _insert_chunk(exam, chunk):
+    questions = Question.objects.bulk_create(
+        [Question(exam=exam, text=text, marks=marks) for text, marks, _, _ in chunk]
+    )
+    Option.objects.bulk_create([
+        Option(question=question, text=option_text, is_correct=(index == correct_index))
+        for question, (_, _, options, correct_index) in zip(questions, chunk)
+        for index, option_text in enumerate(options)
+    ])
+
+
+def import_questions(exam, file, file_format='csv', chunk_size=CHUNK_SIZE):
+    '''Import every question of `file` into `exam`, returns the number imported.
+
+        Raises QuestionImportError listing the bad lines, nothing is saved then.
+    '''
+    stream = _text_stream(file)
+    records = _jsonl_records(stream) if file_format == 'jsonl' else _csv_records(stream)
+
+    imported = 0
+    errors = []
+    chunk = []
+    line_number = 0
+    with transaction.atomic():
+        try:
+            for line_number, record in records:
+                try:
+                    cleaned = _clean(record)
+                except ValueError as e:
+                    errors.append(f"line {line_number}: {e}")
+                    if len(errors) >= MAX_ERRORS:
+                        break
+                    continue
+
+                # after the first error the rest of the file is only validated
+                if errors:
+                    continue
+
+                chunk.append(cleaned)
+                if len(chunk) >= chunk_size:
+                    _insert_chunk(exam, chunk)
+                    imported += len(chunk)
+                    chunk = []
+        # the file is decoded and split lazily while we iterate, these stop the whole read
+        except UnicodeDecodeError:
+            errors.append("the file is not UTF-8 text, save it as UTF-8 and try again")
+        except csv.Error as e:
+            errors.append(f"line {line_number + 1}: {e}")
+
+        if errors:
+            # rolls back the chunks already inserted
+            raise QuestionImportError(errors)
+
+        if chunk:
+            _insert_chunk(exam, chunk)
+            imported += len(chunk)
+
+        if imported:
+            exam.bump_version()
+
+    return imported
+
+
+def guess_format(filename):
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.json')) else 'csv'
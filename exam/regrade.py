@@ -0,0 +1,85 @@
+# exam/regrade.py
+
+from django.db import transaction
+from django.db.models import BooleanField, Case, Exists, F, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+from .answer_key import compile_answer_key
+from .leaderboard import rebuild_leaderboard
+from .models import SemesterGradebook, StudentExamResult, StudentExamSummary
+
+
+'''Set-based regrade after an answer key change
+
+    Every stored answer of a changed question is regraded with one UPDATE keyed
+    on selected_option_id, and the materialized StudentExamSummary and
+    SemesterGradebook totals are moved by the per-student delta instead of
+    rescanning the exam or the semester.
+'''
+
+
+def _new_mark(correct_option_id, marks):
+    if correct_option_id is None:
+        return Value(0)
+    return Case(
+        When(selected_option_id=correct_option_id, then=Value(marks)),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def regrade_questions(exam, question_ids):
+    '''Regrade the given questions across all attempts, returns the number of answers regraded.'''
+    answer_key = compile_answer_key(exam.id)
+    regraded = 0
+
+    with transaction.atomic():
+        for question_id in question_ids:
+            if question_id not in answer_key:
+                continue
+            correct_option_id, marks, _ = answer_key[question_id]
+            new_mark = _new_mark(correct_option_id, marks)
+
+            # answers of this question whose mark is about to change
+            changed = (
+                StudentExamResult.objects.filter(question_id=question_id)
+                .annotate(new_mark=new_mark)
+                .exclude(mark_obtains=F('new_mark'))
+            )
+
+            # 1. move each student's total by (new mark - old mark)
+            delta = changed.filter(
+                exam_id=OuterRef('exam_id'), student_id=OuterRef('student_id')
+            ).annotate(delta=F('new_mark') - F('mark_obtains')).values('delta')[:1]
+
+            StudentExamSummary.objects.filter(exam_id=exam.id).filter(
+                Exists(changed.filter(exam_id=OuterRef('exam_id'), student_id=OuterRef('student_id')))
+            ).update(total_marks=F('total_marks') + Coalesce(Subquery(delta), 0))
+
+            # ... and their semester gradebook total by the same delta
+            semester_delta = changed.filter(
+                exam_id=exam.id, student_id=OuterRef('student_id')
+            ).annotate(delta=F('new_mark') - F('mark_obtains')).values('delta')[:1]
+
+            SemesterGradebook.objects.filter(department_id=exam.department_id, samester=exam.samester).filter(
+                Exists(changed.filter(exam_id=exam.id, student_id=OuterRef('student_id')))
+            ).update(total_marks=F('total_marks') + Coalesce(Subquery(semester_delta), 0))
+
+            # 2. regrade the answers themselves
+            if correct_option_id is None:
+                is_correct = Value(False)
+            else:
+                is_correct = Case(
+                    When(selected_option_id=correct_option_id, then=Value(True)),
+                    default=Value(False),
+                    output_field=BooleanField(),
+                )
+            regraded += StudentExamResult.objects.filter(question_id=question_id).update(
+                is_correct=is_correct,
+                mark_obtains=new_mark,
+            )
+
+        if regraded:
+            rebuild_leaderboard(exam.id)
+
+    return regraded
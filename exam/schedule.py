@@ -0,0 +1,135 @@
+# exam/schedule.py
+
+import heapq
+from bisect import bisect_left
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.cache import cache
+
+from .models import Exam
+
+
+'''Per-cohort exam schedule
+
+    Every (department, samester) cohort has a short list of exam windows,
+    (start_time, end_time, exam id) sorted by start. It is read with one index
+    range scan on exam_cohort_window_idx and cached, so the available exams page
+    only has to pick the open windows and fetch those exams by primary key.
+    Exam.save()/delete() drop the cohort's entry.
+
+    Collision checks use an interval index built over the same sorted list:
+    a max-end segment tree on top of the starts. bisect finds the windows that
+    start before a new exam ends, and the tree only descends into subtrees
+    holding a window still running when it starts, so a check costs
+    O((k + 1) log n) for k overlaps. The index is built once per schedule,
+    O(n), and cached next to it. Windows that only touch (one ends when the
+    next starts) don't collide.
+'''
+
+SCHEDULE_TIMEOUT = 60 * 60
+
+
+def schedule_cache_key(department_id, samester):
+    return f"exam:schedule:{department_id}:{samester}"
+
+
+def load_schedule(department_id, samester):
+    return list(
+        Exam.objects.filter(department_id=department_id, samester=samester)
+        .order_by('start_time', 'end_time')
+        .values_list('start_time', 'end_time', 'id')
+    )
+
+
+def get_schedule(department_id, samester):
+    key = schedule_cache_key(department_id, samester)
+    schedule = cache.get(key)
+    if schedule is None:
+        schedule = load_schedule(department_id, samester)
+        cache.set(key, schedule, SCHEDULE_TIMEOUT)
+    return schedule
+
+
+def index_cache_key(department_id, samester):
+    return f"exam:schedule-index:{department_id}:{samester}"
+
+
+def invalidate_schedule(department_id, samester):
+    cache.delete_many([schedule_cache_key(department_id, samester), index_cache_key(department_id, samester)])
+
+
+def open_exam_ids(department_id, samester, when):
+    return [
+        exam_id
+        for start_time, end_time, exam_id in get_schedule(department_id, samester)
+        if start_time <= when <= end_time
+    ]
+
+
+# end of an empty slot of the tree, before any real window
+NO_END = datetime.min.replace(tzinfo=dt_timezone.utc)
+
+
+class ScheduleIndex:
+    '''Interval index over one cohort's schedule (sorted by start).'''
+
+    def __init__(self, schedule):
+        self.schedule = schedule
+        self.starts = [start_time for start_time, _, _ in schedule]
+
+        # max_end[node] is the latest end among the windows under node,
+        # window i is the leaf size + i, node n has children 2n and 2n + 1
+        self.size = 1
+        while self.size < len(schedule):
+            self.size *= 2
+        self.max_end = [NO_END] * (2 * self.size)
+        for index, (_, end_time, _) in enumerate(schedule):
+            self.max_end[self.size + index] = end_time
+        for node in range(self.size - 1, 0, -1):
+            self.max_end[node] = max(self.max_end[2 * node], self.max_end[2 * node + 1])
+
+    def overlaps(self, start_time, end_time, exclude_id=None):
+        '''Ids of the exams whose window overlaps [start_time, end_time), in start order.'''
+        found = []
+        # only windows starting before end_time can overlap ...
+        limit = bisect_left(self.starts, end_time)
+        stack = [(1, 0, self.size)]
+        while stack:
+            node, low, high = stack.pop()
+            # ... and a subtree is skipped when nothing in it is still running at start_time
+            if low >= limit or self.max_end[node] <= start_time:
+                continue
+            if high - low == 1:
+                exam_id = self.schedule[low][2]
+                if exam_id != exclude_id:
+                    found.append(exam_id)
+                continue
+            middle = (low + high) // 2
+            stack.append((2 * node + 1, middle, high))
+            stack.append((2 * node, low, middle))
+        return found
+
+    def conflicts(self):
+        '''Every overlapping pair (earlier exam id, later exam id), one sweep in start order.'''
+        pairs = []
+        running = []  # heap of (end_time, exam id) still open at the current start
+        for start_time, end_time, exam_id in self.schedule:
+            while running and running[0][0] <= start_time:
+                heapq.heappop(running)
+            pairs.extend((other_id, exam_id) for _, other_id in running)
+            heapq.heappush(running, (end_time, exam_id))
+        return pairs
+
+
+def schedule_index(department_id, samester):
+    key = index_cache_key(department_id, samester)
+    index = cache.get(key)
+    if index is None:
+        index = ScheduleIndex(get_schedule(department_id, samester))
+        cache.set(key, index, SCHEDULE_TIMEOUT)
+    return index
+
+
+def find_conflicts(department_id, samester, start_time, end_time, exclude_id=None):
+    # exams of the cohort that would run at the same time as [start_time, end_time)
+    return schedule_index(department_id, samester).overlaps(start_time, end_time, exclude_id)
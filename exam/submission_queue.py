@@ -0,0 +1,90 @@
+# exam/submission_queue.py
+
+import logging
+from datetime import timedelta
+
+from django.db import OperationalError
+from django.db.models import Subquery
+from django.utils import timezone
+
+from .answer_key import get_answer_key
+from .autosave import pop_buffered_answers
+from .grading import grade_submission
+from .models import ExamSubmission
+
+
+logger = logging.getLogger(__name__)
+
+
+'''Durable grading queue
+
+    When settings.EXAM_GRADING_QUEUE is on, start_exam only stores the answers as
+    an ExamSubmission and hands the student a receipt. The grade_submissions
+    management command runs a pool of workers that claim pending rows in batches
+    and grade them at a controlled rate.
+'''
+
+
+def enqueue_submission(exam, student, posted_answers):
+    # take the autosave buffer now so the row holds everything the worker needs
+    answers = pop_buffered_answers(exam, student)
+    answers.update({question_id: value for question_id, value in posted_answers.items() if value})
+
+    return ExamSubmission.objects.create(
+        exam=exam,
+        student=student,
+        answers={str(question_id): value for question_id, value in answers.items()},
+    )
+
+
+def claim_submissions(worker, limit):
+    '''Mark up to `limit` of the oldest pending submissions as ours, in one UPDATE.'''
+    pending = ExamSubmission.objects.filter(status='pending').order_by('id').values('id')[:limit]
+    claimed = ExamSubmission.objects.filter(id__in=Subquery(pending), status='pending').update(
+        status='processing', worker=worker, claimed_at=timezone.now()
+    )
+    if not claimed:
+        return []
+    return list(
+        ExamSubmission.objects.filter(status='processing', worker=worker)
+        .select_related('exam', 'student')
+        .order_by('id')
+    )
+
+
+def grade_queued_submission(submission):
+    # True once graded, False when it failed or went back to the queue
+    exam = submission.exam
+    answers = {int(question_id): value for question_id, value in submission.answers.items()}
+
+    try:
+        # grade_submission commits on its own: wrapped in another transaction its
+        # reads would come before the first write again. A worker dying in between
+        # leaves the submission 'processing', it is requeued and regraded to the same result.
+        report = grade_submission(exam, submission.student, get_answer_key(exam), answers, merge_stored=True)
+        submission.status = 'graded'
+        submission.total_marks = report.total_marks
+        submission.graded_at = timezone.now()
+        submission.save(update_fields=['status', 'total_marks', 'graded_at'])
+        return True
+    except OperationalError as e:
+        if 'locked' not in str(e):
+            raise
+        # sqlite write lock held by someone else, hand it back to the queue
+        logger.warning("submission %s requeued: %s", submission.receipt, e)
+        ExamSubmission.objects.filter(pk=submission.pk).update(status='pending', worker='')
+        return False
+    except Exception as e:
+        logger.exception("grading submission %s failed", submission.receipt)
+        submission.status = 'failed'
+        submission.error = str(e)
+        submission.save(update_fields=['status', 'error'])
+        return False
+
+
+def requeue_stale_submissions(older_than_minutes):
+    # submissions claimed by a worker that died are handed out again
+    cutoff = timezone.now() - timedelta(minutes=older_than_minutes)
+    return ExamSubmission.objects.filter(status='processing', claimed_at__lt=cutoff).update(
+        status='pending', worker=''
+    )
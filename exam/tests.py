@@ -1,3 +1,876 @@
-from django.test import TestCase
+import csv
+import gzip
+import hashlib
+import hmac
+import io
+import json
+import random
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from faculty.models import TeacherProfile
+from student.models import StudentProfile
+from users.models import Department
+
+from .answer_key import _load_answer_key, compile_answer_key
+from .attempts import close_expired_attempts, get_attempt, start_attempt
+from .autosave import record_answers, saved_answers, seal_attempt
+from .cloning import clone_exam
+from .gradebook import rebuild_gradebook
+from .grading import grade_submission
+from .idempotency import (PENDING, claim_submission, delete_expired_claims, release_submission,
+                          store_outcome, stored_outcome)
+from .item_analysis import build_item_analysis
+from .leaderboard import FenwickTree, Standing, record_score
+from .models import (Exam, ExamAttempt, ExamLeaderboard, ExamSubmission, Option, ProctoringEvent, ProctoringSummary,
+                     Question, SemesterGradebook, StudentExamResult, StudentExamSummary, SubmissionClaim)
+from .offline import _load_bundle
+from .paper import _load_paper, paper_order
+from .paper_editor import PaperEditError, save_paper
+from .proctoring import FLUSH_EVENTS, clean_events, flush_events, record_events
+from .question_import import QuestionImportError, import_questions
+from .regrade import regrade_questions
+from .schedule import ScheduleIndex
+from .submission_queue import claim_submissions, grade_queued_submission, requeue_stale_submissions
+from .summaries import recompute_exam_summaries
+
+
+TEST_SETTINGS = {
+    'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    'PASSWORD_HASHERS': ['django.contrib.auth.hashers.MD5PasswordHasher'],
+    # the page templates show the profile picture, no cloud storage in tests
+    'DEFAULT_FILE_STORAGE': 'django.core.files.storage.FileSystemStorage',
+}
+
+
+@override_settings(**TEST_SETTINGS)
+class ExamTestCase(TestCase):
+    # one exam of QUESTIONS questions (marks 1, 2, 3 ...), option 0 correct, and STUDENTS students
+    QUESTIONS = 4
+    STUDENTS = 2
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(name='CS')
+        cls.teacher = TeacherProfile.objects.create(full_name='Teacher', department=cls.department,
+                                                    teacher_id='T1', password='pw',
+                                                    profile_picture='teacher_profiles/T1.png')
+        cls.students = [
+            StudentProfile.objects.create(full_name=f'Student {i}', department=cls.department, year=1,
+                                          samester=1, roll_number=f'R{i}', password='pw',
+                                          profile_picture=f'student_profiles/R{i}.png')
+            for i in range(cls.STUDENTS)
+        ]
+        now = timezone.now()
+        cls.exam = Exam.objects.create(title='Exam', teacher=cls.teacher, department=cls.department, samester=1,
+                                       start_time=now - timedelta(hours=1), end_time=now + timedelta(hours=1),
+                                       duration_miniutes=30)
+        for i in range(cls.QUESTIONS):
+            question = Question.objects.create(exam=cls.exam, text=f'Question {i}', marks=i + 1)
+            for j in range(4):
+                Option.objects.create(question=question, text=f'Option {j}', is_correct=(j == 0))
+        cls.exam.bump_version()
+
+    def setUp(self):
+        # ids are reused between tests, nothing may come from an earlier test's caches
+        cache.clear()
+        _load_answer_key.cache_clear()
+        _load_paper.cache_clear()
+        _load_bundle.cache_clear()
+        self.exam.refresh_from_db()
+        self.answer_key = compile_answer_key(self.exam.id)
+        self.questions = list(self.answer_key)
+
+    def option(self, question_id, index):
+        return Option.objects.filter(question_id=question_id).order_by('id').values_list('id', flat=True)[index]
+
+    def right(self, question_id):
+        return str(self.answer_key[question_id][0])
+
+    def wrong(self, question_id):
+        return str(self.option(question_id, 1))
+
+
+class GradingTests(ExamTestCase):
+
+    def test_grades_in_memory(self):
+        q1, q2, q3, q4 = self.questions
+        answers = {q1: self.right(q1), q2: self.wrong(q2), q3: 'junk'}
+        report = grade_submission(self.exam, self.students[0], self.answer_key, answers)
+
+        self.assertEqual(report.total_marks, 1)
+        self.assertEqual(report.correct_answers, 1)
+        self.assertEqual(report.total_questions, 4)
+        results = StudentExamResult.objects.filter(exam=self.exam, student=self.students[0])
+        self.assertEqual(results.count(), 4)
+        self.assertIsNone(results.get(question_id=q3).selected_option_id)
+
+    def test_option_of_another_question_is_not_an_answer(self):
+        q1, q2 = self.questions[:2]
+        report = grade_submission(self.exam, self.students[0], self.answer_key, {q1: self.right(q2)})
+        self.assertEqual(report.total_marks, 0)
+
+    def test_seal_merges_posted_over_buffered_over_saved(self):
+        q1, q2, q3, q4 = self.questions
+        student = self.students[0]
+        # saved rows: q1 wrong, q2 right
+        grade_submission(self.exam, student, self.answer_key, {q1: self.wrong(q1), q2: self.right(q2)})
+        # still buffered: q1 right, q3 wrong
+        record_answers(self.exam, student, self.answer_key, {q1: self.right(q1), q3: self.wrong(q3)})
+        # posted: q3 right
+        report = seal_attempt(self.exam, student, self.answer_key, {q3: self.right(q3), q4: ''})
+
+        self.assertEqual(report.total_marks, 1 + 2 + 3)
+        summary = StudentExamSummary.objects.get(exam=self.exam, student=student)
+        self.assertEqual(summary.total_marks, 6)
+
+    def test_regrading_same_answers_writes_nothing(self):
+        student = self.students[0]
+        answers = {question_id: self.right(question_id) for question_id in self.questions}
+        grade_submission(self.exam, student, self.answer_key, answers, merge_stored=True)
+        with CaptureQueriesContext(connection) as queries:
+            report = grade_submission(self.exam, student, self.answer_key, answers, merge_stored=True)
+        self.assertEqual(report.total_marks, 10)
+
+        # closing the attempt, locking the summary, the locked total, stored rows,
+        # summary upsert: no result, board or gradebook writes, and nothing is
+        # read before the transaction holds its locks
+        statements = [query['sql'].split()[0] for query in queries.captured_queries
+                      if 'SAVEPOINT' not in query['sql']]
+        self.assertEqual(statements, ['UPDATE', 'INSERT', 'SELECT', 'SELECT', 'INSERT'])
+
+    def test_totals_follow_regrading_of_a_student(self):
+        student = self.students[0]
+        grade_submission(self.exam, student, self.answer_key, {})
+        grade_submission(self.exam, student, self.answer_key,
+                         {question_id: self.right(question_id) for question_id in self.questions})
+
+        gradebook = SemesterGradebook.objects.get(student=student, samester=1)
+        self.assertEqual((gradebook.exams_attempted, gradebook.total_marks), (1, 10))
+        board = ExamLeaderboard.objects.get(exam=self.exam)
+        self.assertEqual(board.students, 1)
+        self.assertEqual(Standing(board).rank(10), 1)
+
+
+class AvailableExamsTests(ExamTestCase):
+
+    def available(self):
+        response = self.client.get(reverse('student:available_exams'))
+        return [exam.id for exam in response.context['exams']]
+
+    def test_open_exams_of_the_students_cohort(self):
+        now = timezone.now()
+        later = Exam.objects.create(title='Later', teacher=self.teacher, department=self.department, samester=1,
+                                    start_time=now + timedelta(hours=2), end_time=now + timedelta(hours=3),
+                                    duration_miniutes=30)
+        Exam.objects.create(title='Other semester', teacher=self.teacher, department=self.department, samester=2,
+                            start_time=now - timedelta(hours=1), end_time=now + timedelta(hours=1),
+                            duration_miniutes=30)
+        self.client.force_login(self.students[0].user)
+        self.assertEqual(self.available(), [self.exam.id])
+
+        # the cached schedule follows edits: moved into the window, and out of the cohort
+        later.start_time = now - timedelta(minutes=5)
+        later.save()
+        self.assertEqual(self.available(), [self.exam.id, later.id])
+        self.exam.samester = 2
+        self.exam.save()
+        self.assertEqual(self.available(), [later.id])
+
+    def test_totals_are_stored_on_the_exam(self):
+        self.assertEqual((self.exam.question_count, self.exam.total_marks), (4, 10))
+        Question.objects.filter(id=self.questions[0]).delete()
+        self.exam.bump_version()
+        self.assertEqual((self.exam.question_count, self.exam.total_marks), (3, 9))
+
+
+class CloningTests(ExamTestCase):
+    QUESTIONS = 6
+
+    def paper(self, exam):
+        return [(question.text, question.marks, [(option.text, option.is_correct)
+                                                 for option in question.Options.order_by('id')])
+                for question in Question.objects.filter(exam=exam).order_by('id')]
+
+    def test_clone_copies_the_paper(self):
+        start_time = self.exam.start_time + timedelta(days=7)
+        # two reads, one insert per model (and the savepoint pair)
+        with self.assertNumQueries(7):
+            clone = clone_exam(self.exam, self.teacher, start_time, start_time + timedelta(hours=2),
+                               samester=2, title='Retake')
+
+        self.assertEqual((clone.title, clone.samester, clone.duration_miniutes), ('Retake', 2, 30))
+        self.assertEqual(self.paper(clone), self.paper(self.exam))
+        clone.refresh_from_db()
+        self.assertEqual((clone.question_count, clone.total_marks), (6, 21))
+        self.assertEqual(len(compile_answer_key(clone.id)), 6)
+
+    def test_clone_selected_questions(self):
+        q1, _, q3 = self.questions[:3]
+        start_time = self.exam.start_time + timedelta(days=7)
+        clone = clone_exam(self.exam, self.teacher, start_time, start_time + timedelta(hours=2), question_ids=[q1, q3])
+        self.assertEqual(self.paper(clone), [self.paper(self.exam)[0], self.paper(self.exam)[2]])
+        self.assertEqual((clone.question_count, clone.total_marks), (2, 4))
+
+
+class ExamModelTests(ExamTestCase):
+
+    def test_saving_a_stale_exam_keeps_the_version(self):
+        stale = Exam.objects.get(id=self.exam.id)
+        Question.objects.create(exam=self.exam, text='Added', marks=5)
+        self.exam.bump_version()
+
+        stale.title = 'Renamed'
+        stale.save()
+        exam = Exam.objects.get(id=self.exam.id)
+        self.assertEqual((exam.title, exam.version, exam.question_count, exam.total_marks),
+                         ('Renamed', self.exam.version, 5, 15))
+
+
+class AttemptTests(ExamTestCase):
+
+    def expire(self, student):
+        ExamAttempt.objects.filter(exam=self.exam, student=student).update(
+            deadline=timezone.now() - timedelta(minutes=5))
+        cache.clear()
+
+    def test_clock_starts_once(self):
+        student = self.students[0]
+        attempt = start_attempt(self.exam, student)
+        self.assertAlmostEqual(attempt.remaining_seconds(), 30 * 60, delta=2)
+        self.assertEqual(start_attempt(self.exam, student).started_at, attempt.started_at)
+
+        # the deadline never passes the end of the exam
+        Exam.objects.filter(id=self.exam.id).update(end_time=timezone.now() + timedelta(minutes=10))
+        self.exam.refresh_from_db()
+        self.assertLessEqual(start_attempt(self.exam, self.students[1]).deadline, self.exam.end_time)
+
+        cache.clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(get_attempt(self.exam, student).deadline, attempt.deadline)
+        with self.assertNumQueries(0):
+            get_attempt(self.exam, student)
+
+    def test_late_submit_keeps_only_autosaved_answers(self):
+        q1, q2 = self.questions[:2]
+        student = self.students[0]
+        self.client.force_login(student.user)
+        self.client.get(reverse('student:start_exam', args=[self.exam.id]))
+        record_answers(self.exam, student, self.answer_key, {q1: self.right(q1)}, flush=True)
+        self.expire(student)
+
+        self.client.post(reverse('student:start_exam', args=[self.exam.id]),
+                         {f'q_correct_{q1}': self.right(q1), f'q_correct_{q2}': self.right(q2)})
+        self.assertEqual(StudentExamSummary.objects.get(exam=self.exam, student=student).total_marks, 1)
+
+    def test_expired_attempts_are_closed(self):
+        q1 = self.questions[0]
+        running, expired = self.students
+        start_attempt(self.exam, running)
+        start_attempt(self.exam, expired)
+        record_answers(self.exam, expired, self.answer_key, {q1: self.right(q1)}, flush=True)
+        self.expire(expired)
+
+        self.assertEqual(close_expired_attempts(), 1)
+        self.assertEqual(close_expired_attempts(), 0)
+        self.assertEqual(list(StudentExamSummary.objects.values_list('student_id', 'total_marks')), [(expired.id, 1)])
+        self.assertTrue(get_attempt(self.exam, expired).submitted)
+
+
+class AutosaveTests(ExamTestCase):
+
+    def test_buffers_until_flushed(self):
+        q1, q2 = self.questions[:2]
+        student = self.students[0]
+        start_attempt(self.exam, student)
+
+        self.assertEqual(record_answers(self.exam, student, self.answer_key, {q1: self.right(q1)}), (1, 0))
+        self.assertFalse(StudentExamResult.objects.exists())
+        self.assertEqual(record_answers(self.exam, student, self.answer_key, {q2: self.wrong(q2)}, flush=True),
+                         (0, 2))
+        self.assertEqual(saved_answers(self.exam, student), {q1: int(self.right(q1)), q2: int(self.wrong(q2))})
+
+    def test_flush_after_submit_writes_nothing(self):
+        q1 = self.questions[0]
+        student = self.students[0]
+        start_attempt(self.exam, student)
+        seal_attempt(self.exam, student, self.answer_key, {q1: self.right(q1)})
+        self.assertTrue(ExamAttempt.objects.get(exam=self.exam, student=student).submitted_at)
+
+        self.assertEqual(record_answers(self.exam, student, self.answer_key, {q1: self.wrong(q1)}, flush=True),
+                         (0, 0))
+        result = StudentExamResult.objects.get(exam=self.exam, student=student, question_id=q1)
+        self.assertEqual((result.selected_option_id, result.mark_obtains), (int(self.right(q1)), 1))
+
+    def test_submitted_paper_can_not_be_reopened_or_autosaved(self):
+        q1 = self.questions[0]
+        student = self.students[0]
+        self.client.force_login(student.user)
+        self.assertEqual(self.client.get(reverse('student:start_exam', args=[self.exam.id])).status_code, 200)
+        self.client.post(reverse('student:start_exam', args=[self.exam.id]), {f'q_correct_{q1}': self.right(q1)})
+
+        response = self.client.post(reverse('student:autosave_exam', args=[self.exam.id]),
+                                    f'{{"answers": {{"{q1}": "{self.wrong(q1)}"}}, "flush": true}}',
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(reverse('student:start_exam', args=[self.exam.id]))
+        self.assertRedirects(response, reverse('student:available_exams'), fetch_redirect_response=False)
+        self.assertEqual(StudentExamSummary.objects.get(exam=self.exam, student=student).total_marks, 1)
+
+
+class IdempotencyTests(ExamTestCase):
+
+    def test_first_claim_wins(self):
+        student = self.students[0]
+        self.assertTrue(claim_submission(self.exam, student, 'key'))
+        self.assertFalse(claim_submission(self.exam, student, 'key'))
+        self.assertEqual(stored_outcome(self.exam, student, 'key'), PENDING)
+
+        store_outcome(self.exam, student, 'key', {'message': 'done'})
+        cache.clear()
+        self.assertEqual(stored_outcome(self.exam, student, 'key'), {'message': 'done'})
+
+        release_submission(self.exam, student, 'key')
+        self.assertTrue(claim_submission(self.exam, student, 'key'))
+
+    def test_repeated_post_is_graded_once(self):
+        q1 = self.questions[0]
+        student = self.students[0]
+        self.client.force_login(student.user)
+        self.client.get(reverse('student:start_exam', args=[self.exam.id]))
+        data = {'submission_key': 'paper-1', f'q_correct_{q1}': self.right(q1)}
+
+        first = self.client.post(reverse('student:start_exam', args=[self.exam.id]), data)
+        data[f'q_correct_{q1}'] = self.wrong(q1)
+        second = self.client.post(reverse('student:start_exam', args=[self.exam.id]), data)
+        self.assertEqual(first['Location'], second['Location'])
+        self.assertEqual(StudentExamSummary.objects.get(exam=self.exam, student=student).total_marks, 1)
+
+    def test_expired_claims_are_deleted(self):
+        student = self.students[0]
+        claim_submission(self.exam, student, 'old')
+        claim_submission(self.exam, student, 'new')
+        SubmissionClaim.objects.filter(key='old').update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(delete_expired_claims(), 1)
+        self.assertEqual(list(SubmissionClaim.objects.values_list('key', flat=True)), ['new'])
+
+
+class OfflineTests(ExamTestCase):
+
+    def download(self, student):
+        self.client.force_login(student.user)
+        return self.client.get(reverse('student:offline_bundle', args=[self.exam.id]))
+
+    def submit(self, token, answers, key):
+        answers_json = json.dumps({str(question_id): value for question_id, value in answers.items()})
+        checksum = hmac.new(key.encode(), answers_json.encode(), hashlib.sha256).hexdigest()
+        return self.client.post(reverse('student:offline_submit', args=[self.exam.id]),
+                                json.dumps({'token': token, 'answers': answers_json, 'checksum': checksum}),
+                                content_type='application/json')
+
+    def test_bundle_and_submit(self):
+        q1, q2 = self.questions[:2]
+        student = self.students[0]
+        response = self.download(student)
+        paper = json.loads(gzip.decompress(response.content))
+        self.assertEqual([question['id'] for question in paper['questions']], self.questions)
+        self.assertNotIn('is_correct', json.dumps(paper))
+
+        response = self.submit(response['X-Attempt-Token'], {q1: self.right(q1), q2: self.right(q2)},
+                               response['X-Checksum-Key'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(StudentExamSummary.objects.get(exam=self.exam, student=student).total_marks, 3)
+        self.assertEqual(self.download(student).status_code, 403)
+
+    def test_rejected_submissions(self):
+        q1 = self.questions[0]
+        response = self.download(self.students[0])
+        token, key = response['X-Attempt-Token'], response['X-Checksum-Key']
+
+        self.assertEqual(self.submit(token, {q1: self.right(q1)}, 'not the key').status_code, 403)
+        response = self.client.post(reverse('student:offline_submit', args=[self.exam.id]),
+                                    json.dumps({'token': token, 'answers': {str(q1): 1}, 'checksum': ''}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+        self.exam.bump_version()
+        self.assertEqual(self.submit(token, {q1: self.right(q1)}, key).status_code, 403)
+        self.assertFalse(StudentExamResult.objects.exists())
+
+
+@override_settings(EXAM_PAGE_SIZE=3)
+class PagedPaperTests(ExamTestCase):
+
+    def page_questions(self, response):
+        # question ids in the order of their radio groups
+        return list(dict.fromkeys(int(question_id) for question_id in
+                                  re.findall(r'name="q_correct_(\d+)"', response.content.decode())))
+
+    def test_pages_follow_the_students_order(self):
+        student = self.students[0]
+        self.client.force_login(student.user)
+        first = self.client.get(reverse('student:start_exam', args=[self.exam.id]))
+        second = self.client.get(reverse('student:exam_page', args=[self.exam.id, 1]))
+
+        order = [question_id for question_id, _, _, _ in paper_order(self.exam, student)]
+        self.assertEqual(self.page_questions(first), order[:3])
+        self.assertEqual(self.page_questions(second), order[3:])
+        self.assertEqual(self.client.get(reverse('student:exam_page', args=[self.exam.id, 2])).status_code, 404)
+
+    def test_pages_need_an_open_attempt(self):
+        self.client.force_login(self.students[0].user)
+        page_url = reverse('student:exam_page', args=[self.exam.id, 0])
+        self.assertEqual(self.client.get(page_url).status_code, 403)
+        self.client.get(reverse('student:start_exam', args=[self.exam.id]))
+        self.assertEqual(self.client.get(page_url).status_code, 200)
+        self.client.post(reverse('student:start_exam', args=[self.exam.id]), {})
+        self.assertEqual(self.client.get(page_url).status_code, 403)
+
+
+class ShuffleTests(ExamTestCase):
+    QUESTIONS = 8
+
+    def order(self, student):
+        return [(question_id, [option_id for option_id, _ in options])
+                for question_id, _, options, _ in paper_order(self.exam, student)]
+
+    def test_every_student_has_a_stable_order_of_their_own(self):
+        a, b = self.students
+        self.assertEqual(self.order(a), self.order(a))
+        self.assertNotEqual(self.order(a), self.order(b))
+        self.assertEqual(sorted(question_id for question_id, _ in self.order(a)), self.questions)
+        self.assertEqual({question_id: sorted(options) for question_id, options in self.order(a)},
+                         {question_id: sorted(self.answer_key[question_id][2]) for question_id in self.questions})
+
+    @override_settings(EXAM_SHUFFLE_PAPERS=False)
+    def test_shuffling_can_be_turned_off(self):
+        self.assertEqual([question_id for question_id, _ in self.order(self.students[0])], self.questions)
+
+
+class ProctoringTests(ExamTestCase):
+
+    def test_clean_events(self):
+        now = timezone.now()
+        started_at = now - timedelta(minutes=10)
+        events = [{'type': 'copy', 'at': (now - timedelta(minutes=5)).timestamp() * 1000},
+                  {'type': 'paste', 'at': 0},
+                  {'type': 'blink'},
+                  'junk',
+                  {'type': 'tab_hidden', 'at': 'soon'}]
+        cleaned = clean_events(events, started_at, now)
+        self.assertEqual([kind for kind, _ in cleaned], ['copy', 'paste', 'tab_hidden'])
+        self.assertAlmostEqual(cleaned[0][1], now - timedelta(minutes=5), delta=timedelta(milliseconds=1))
+        # times are clamped into the attempt
+        self.assertEqual([occurred_at for _, occurred_at in cleaned[1:]], [started_at, now])
+
+    def test_buffered_until_flushed(self):
+        student = self.students[0]
+        now = timezone.now()
+        self.assertEqual(record_events(self.exam, student, [('copy', now)]), (1, 0))
+        self.assertEqual(record_events(self.exam, student, [('paste', now)] * (FLUSH_EVENTS - 1)), (0, FLUSH_EVENTS))
+        self.assertEqual(record_events(self.exam, student, [('copy', now)] * 2), (2, 0))
+        self.assertEqual(flush_events(self.exam, student), 2)
+        self.assertEqual(flush_events(self.exam, student), 0)
+
+        summary = ProctoringSummary.objects.get(exam=self.exam, student=student)
+        self.assertEqual((summary.copy, summary.paste, summary.total_events), (3, FLUSH_EVENTS - 1, FLUSH_EVENTS + 2))
+        self.assertEqual(ProctoringEvent.objects.count(), FLUSH_EVENTS + 2)
+
+    def test_events_view(self):
+        student = self.students[0]
+        url = reverse('student:proctoring_events', args=[self.exam.id])
+        self.client.force_login(student.user)
+        self.assertEqual(self.client.post(url, '{"events": []}', content_type='application/json').status_code, 403)
+
+        start_attempt(self.exam, student)
+        response = self.client.post(url, '{"events": [{"type": "copy"}]}', content_type='application/json')
+        self.assertEqual(response.json(), {'buffered': 1, 'written': 0})
+        self.assertEqual(self.client.post(url, '{"events": 5}', content_type='application/json').status_code, 400)
+
+        # the submit writes what is still buffered, later events are refused
+        self.client.post(reverse('student:start_exam', args=[self.exam.id]), {})
+        self.assertEqual(ProctoringSummary.objects.get(exam=self.exam, student=student).copy, 1)
+        self.assertEqual(self.client.post(url, '{"events": []}', content_type='application/json').status_code, 403)
+
+
+class RegradeTests(ExamTestCase):
+    STUDENTS = 3
+
+    def test_regrade_moves_totals_by_delta(self):
+        q1, q2 = self.questions[:2]
+        a, b, c = self.students
+        grade_submission(self.exam, a, self.answer_key, {q1: self.right(q1), q2: self.right(q2)})
+        grade_submission(self.exam, b, self.answer_key, {q1: self.wrong(q1), q2: self.right(q2)})
+        grade_submission(self.exam, c, self.answer_key, {})
+
+        # option 1 of q1 becomes the correct one
+        Option.objects.filter(question_id=q1).update(is_correct=False)
+        Option.objects.filter(id=self.option(q1, 1)).update(is_correct=True)
+        self.exam.bump_version()
+        regraded = regrade_questions(self.exam, [q1])
+        self.assertEqual(regraded, 3)
+
+        totals = dict(StudentExamSummary.objects.filter(exam=self.exam).values_list('student_id', 'total_marks'))
+        self.assertEqual(totals, {a.id: 2, b.id: 3, c.id: 0})
+
+        gradebook = dict(SemesterGradebook.objects.values_list('student_id', 'total_marks'))
+        self.assertEqual(gradebook, totals)
+        rebuild_gradebook(self.department.id, 1)
+        self.assertEqual(dict(SemesterGradebook.objects.values_list('student_id', 'total_marks')), totals)
+
+        standing = Standing(ExamLeaderboard.objects.get(exam=self.exam))
+        self.assertEqual([standing.rank(totals[s.id]) for s in (a, b, c)], [2, 1, 3])
+
+    def test_first_board_of_an_already_graded_exam_counts_everyone(self):
+        for student in self.students:
+            grade_submission(self.exam, student, self.answer_key, {})
+        ExamLeaderboard.objects.all().delete()
+
+        StudentExamSummary.objects.filter(student=self.students[0]).update(total_marks=4)
+        record_score(self.exam, 0, 4)
+
+        board = ExamLeaderboard.objects.get(exam=self.exam)
+        self.assertEqual(board.students, 3)
+        self.assertEqual(FenwickTree(board.tree).counts(), [2, 0, 0, 0, 1])
+
+
+@override_settings(EXAM_GRADING_QUEUE=True)
+class SubmissionQueueTests(ExamTestCase):
+
+    def test_submit_is_queued_and_graded_by_a_worker(self):
+        q1, q2 = self.questions[:2]
+        student = self.students[0]
+        self.client.force_login(student.user)
+        self.client.get(reverse('student:start_exam', args=[self.exam.id]))
+        self.client.post(reverse('student:autosave_exam', args=[self.exam.id]),
+                         f'{{"answers": {{"{q1}": "{self.right(q1)}"}}}}', content_type='application/json')
+
+        response = self.client.post(reverse('student:start_exam', args=[self.exam.id]),
+                                    {f'q_correct_{q2}': self.right(q2)})
+        submission = ExamSubmission.objects.get()
+        self.assertRedirects(response, reverse('student:submission_status', args=[submission.receipt]),
+                             fetch_redirect_response=False)
+        # the buffered answer travels with the submission, nothing is graded yet
+        self.assertEqual(submission.answers, {str(q1): self.right(q1), str(q2): self.right(q2)})
+        self.assertFalse(StudentExamSummary.objects.exists())
+
+        claimed = claim_submissions('worker-1', 10)
+        self.assertEqual(claimed, [submission])
+        self.assertEqual(claim_submissions('worker-2', 10), [])
+        self.assertTrue(grade_queued_submission(claimed[0]))
+
+        status = self.client.get(reverse('student:submission_status', args=[submission.receipt]), {'format': 'json'})
+        self.assertEqual((status.json()['status'], status.json()['total_marks']), ('graded', 3))
+        self.assertEqual(StudentExamSummary.objects.get(exam=self.exam, student=student).total_marks, 3)
+
+    def test_stale_claims_are_requeued(self):
+        submission = ExamSubmission.objects.create(exam=self.exam, student=self.students[0], answers={},
+                                                   status='processing', worker='gone',
+                                                   claimed_at=timezone.now() - timedelta(minutes=30))
+        self.assertEqual(requeue_stale_submissions(60), 0)
+        self.assertEqual(requeue_stale_submissions(10), 1)
+        self.assertEqual(claim_submissions('worker-1', 10), [submission])
+
+
+class SummaryTests(ExamTestCase):
+    STUDENTS = 3
+
+    def test_recompute_leaves_out_running_attempts(self):
+        q1, q2 = self.questions[:2]
+        done, running, _ = self.students
+        start_attempt(self.exam, done)
+        seal_attempt(self.exam, done, self.answer_key, {q1: self.right(q1)})
+        start_attempt(self.exam, running)
+        record_answers(self.exam, running, self.answer_key, {q2: self.right(q2)}, flush=True)
+        # a stale total is put right
+        StudentExamSummary.objects.filter(student=done).update(total_marks=7)
+
+        self.assertEqual(recompute_exam_summaries(self.exam.id), 1)
+        summary = StudentExamSummary.objects.get(exam=self.exam)
+        self.assertEqual((summary.student_id, summary.total_marks), (done.id, 1))
+        self.assertEqual(ExamLeaderboard.objects.get(exam=self.exam).students, 1)
+        self.assertEqual(list(SemesterGradebook.objects.values_list('student_id', 'exams_attempted')),
+                         [(done.id, 1)])
+
+
+class PaperEditorTests(ExamTestCase):
+    QUESTIONS = 2
+
+    def payload(self):
+        return [
+            {'id': question.id, 'text': question.text, 'marks': question.marks,
+             'options': [{'id': option.id, 'text': option.text, 'is_correct': option.is_correct}
+                         for option in question.Options.order_by('id')]}
+            for question in Question.objects.filter(exam=self.exam).order_by('id')
+        ]
+
+    def test_writes_only_the_diff(self):
+        payload = self.payload()
+        payload[0]['text'] = 'Changed'
+        payload[1]['options'].pop()
+        payload.append({'id': None, 'text': 'New', 'marks': 3,
+                        'options': [{'id': None, 'text': 'a', 'is_correct': True}, {'text': 'b'}]})
+        version = self.exam.version
+
+        self.assertEqual(save_paper(self.exam, payload), {'created': 3, 'updated': 1, 'deleted': 1})
+        self.exam.refresh_from_db()
+        self.assertEqual((self.exam.version, self.exam.question_count, self.exam.total_marks), (version + 1, 3, 6))
+        self.assertEqual(save_paper(self.exam, self.payload()), {'created': 0, 'updated': 0, 'deleted': 0})
+
+    def test_payload_of_the_wrong_shape(self):
+        for broken in (lambda payload: 5,
+                       lambda payload: payload[0].update(options=5),
+                       lambda payload: payload[0].update(id=[1]),
+                       lambda payload: payload[0]['options'][0].update(id='1'),
+                       lambda payload: payload[0]['options'].append('x')):
+            payload = self.payload()
+            payload = broken(payload) or payload
+            with self.assertRaises(PaperEditError):
+                save_paper(self.exam, payload)
+
+        teacher = self.teacher.user
+        self.client.force_login(teacher)
+        response = self.client.post(reverse('faculty:save_exam_paper', args=[self.exam.id]),
+                                    {'payload': json.dumps({'questions': 5})})
+        self.assertEqual(response.status_code, 302)
+
+    def test_chosen_option_is_not_deleted(self):
+        q1 = self.questions[0]
+        grade_submission(self.exam, self.students[0], self.answer_key, {q1: self.wrong(q1)})
+        payload = self.payload()
+        chosen = payload[0]['options'].pop(1)
+        payload[1]['options'].pop()
+
+        with self.assertRaises(PaperEditError) as raised:
+            save_paper(self.exam, payload)
+        self.assertEqual(raised.exception.errors,
+                         [f'Question 1: option "{chosen["text"]}" was chosen by students and can not be removed'])
+        self.assertEqual(Option.objects.filter(question__exam=self.exam).count(), 8)
+        self.assertEqual(StudentExamResult.objects.filter(selected_option_id=chosen['id']).count(), 1)
+
+
+class GradebookTests(ExamTestCase):
+
+    def test_deleted_exam_leaves_the_gradebook(self):
+        student = self.students[0]
+        other = Exam.objects.create(title='Other', teacher=self.teacher, department=self.department, samester=1,
+                                    start_time=self.exam.start_time, end_time=self.exam.end_time,
+                                    duration_miniutes=30)
+        question = Question.objects.create(exam=other, text='Other question', marks=5)
+        Option.objects.create(question=question, text='Right', is_correct=True)
+        other.bump_version()
+        grade_submission(self.exam, student, self.answer_key, {self.questions[2]: self.right(self.questions[2])})
+        grade_submission(other, student, compile_answer_key(other.id), {})
+
+        self.exam.delete()
+        gradebook = SemesterGradebook.objects.get(student=student)
+        self.assertEqual((gradebook.exams_attempted, gradebook.total_marks), (1, 0))
+
+        other.delete()
+        self.assertFalse(SemesterGradebook.objects.exists())
+
+
+class LeaderboardViewTests(ExamTestCase):
+
+    def test_only_the_exam_teacher_gets_the_leaderboard(self):
+        other = TeacherProfile.objects.create(full_name='Other', department=self.department, teacher_id='T2',
+                                              password='pw', profile_picture='teacher_profiles/T2.png')
+        leaderboard_url = reverse('faculty:exam_leaderboard', args=[self.exam.id])
+
+        self.client.force_login(self.teacher.user)
+        self.assertContains(self.client.get(reverse('faculty:update_exam', args=[self.exam.id])), leaderboard_url)
+        self.assertEqual(self.client.get(leaderboard_url).status_code, 200)
+
+        self.client.force_login(other.user)
+        self.assertNotContains(self.client.get(reverse('faculty:update_exam', args=[self.exam.id])), leaderboard_url)
+        self.assertEqual(self.client.get(leaderboard_url).status_code, 404)
+
+
+class ItemAnalysisTests(ExamTestCase):
+    QUESTIONS = 2
+    STUDENTS = 4
+
+    def test_report(self):
+        q1, q2 = self.questions
+        # an option added to the first question later gets the highest id
+        late = Option.objects.create(question_id=q1, text='Late option')
+        self.exam.bump_version()
+        self.answer_key = compile_answer_key(self.exam.id)
+        a, b, c, d = self.students
+        grade_submission(self.exam, a, self.answer_key, {q1: self.right(q1), q2: self.right(q2)})
+        grade_submission(self.exam, b, self.answer_key, {q1: self.right(q1), q2: self.wrong(q2)})
+        grade_submission(self.exam, c, self.answer_key, {q1: str(late.id), q2: self.wrong(q2)})
+        grade_submission(self.exam, d, self.answer_key, {q2: self.wrong(q2)})
+
+        report = build_item_analysis(self.exam.id)
+        self.assertEqual(report['students'], 4)
+        first, second = report['questions']
+        self.assertEqual((first['difficulty'], second['difficulty']), (0.5, 0.25))
+        self.assertEqual((first['unanswered_rate'], second['unanswered_rate']), (0.25, 0.0))
+        self.assertEqual([option['pick_rate'] for option in first['options']], [0.5, 0.0, 0.0, 0.0, 0.25])
+        self.assertEqual([option['pick_rate'] for option in second['options']], [0.25, 0.75, 0.0, 0.0])
+        # correct answers against the rest score: q1 [1, 1, 0, 0] with [2, 0, 0, 0], q2 [1, 0, 0, 0] with [1, 1, 0, 0]
+        self.assertEqual((first['discrimination'], second['discrimination']), (0.577, 0.577))
+
+    def test_no_answers(self):
+        report = build_item_analysis(self.exam.id)
+        self.assertEqual(report['students'], 0)
+        self.assertEqual([question['difficulty'] for question in report['questions']], [None, None])
+
+
+class ResultsExportTests(ExamTestCase):
+    QUESTIONS = 2
+    STUDENTS = 3
+
+    def test_one_row_per_submitted_paper(self):
+        q1, q2 = self.questions
+        a, b, running = self.students
+        grade_submission(self.exam, a, self.answer_key, {q1: self.right(q1), q2: self.wrong(q2)})
+        grade_submission(self.exam, b, self.answer_key, {q2: self.right(q2)})
+        start_attempt(self.exam, running)
+        record_answers(self.exam, running, self.answer_key, {q1: self.right(q1)}, flush=True)
+
+        self.client.force_login(self.teacher.user)
+        response = self.client.get(reverse('faculty:export_exam_results', args=[self.exam.id]))
+        self.assertIn('attachment', response['Content-Disposition'])
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows, [
+            ['Student', 'Roll Number', 'Q1', 'Q2', 'Correct Answers', 'Total Marks'],
+            ['Student 0', 'R0', 'Option 0', 'Option 1', '1', '1'],
+            ['Student 1', 'R1', '', 'Option 0', '1', '2'],
+        ])
+
+
+class FenwickTreeTests(SimpleTestCase):
+
+    def test_adds_match_from_counts(self):
+        counts = [3, 0, 2, 5, 0, 1, 4]
+        tree = FenwickTree()
+        for score, count in enumerate(counts):
+            tree.add(score, count)
+        self.assertEqual(tree.counts(), counts)
+        self.assertEqual(FenwickTree.from_counts(counts).counts(), counts)
+        self.assertEqual([tree.prefix(score) for score in range(len(counts))], [3, 3, 5, 10, 10, 11, 15])
+
+    def test_grow_keeps_counts(self):
+        tree = FenwickTree.from_counts([1, 2])
+        tree.add(9, 1)
+        self.assertEqual(tree.counts(), [1, 2, 0, 0, 0, 0, 0, 0, 0, 1])
+        self.assertEqual(tree.prefix(100), 4)
+
+    def test_rank_and_percentile(self):
+        board = ExamLeaderboard(tree=FenwickTree.from_counts([1, 0, 2, 0, 1]).tree, students=4)
+        standing = Standing(board)
+        self.assertEqual([standing.rank(score) for score in (4, 2, 0)], [1, 2, 4])
+        self.assertEqual(standing.percentile(2), 75.0)
+        self.assertEqual(standing.percentile(4), 100.0)
+
+    def test_empty_board(self):
+        standing = Standing(None)
+        self.assertEqual(standing.rank(5), 1)
+        self.assertIsNone(standing.percentile(5))
+
+
+class ScheduleIndexTests(SimpleTestCase):
+    base = datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+
+    def window(self, start, length, exam_id):
+        return (self.base + timedelta(minutes=start), self.base + timedelta(minutes=start + length), exam_id)
+
+    def test_touching_windows_do_not_overlap(self):
+        index = ScheduleIndex([self.window(0, 60, 1), self.window(60, 60, 2)])
+        self.assertEqual(index.conflicts(), [])
+        start, end, _ = self.window(60, 60, 0)
+        self.assertEqual(index.overlaps(start, end), [2])
+        self.assertEqual(index.overlaps(start, end, exclude_id=2), [])
+
+    def test_empty_schedule(self):
+        index = ScheduleIndex([])
+        self.assertEqual(index.overlaps(self.base, self.base + timedelta(hours=1)), [])
+        self.assertEqual(index.conflicts(), [])
+
+    def test_matches_pairwise_scan(self):
+        rng = random.Random(25)
+        for _ in range(200):
+            schedule = sorted(self.window(rng.randint(0, 300), rng.randint(1, 90), exam_id)
+                              for exam_id in range(rng.randint(0, 30)))
+            index = ScheduleIndex(schedule)
+
+            pairs = {(a[2], b[2]) for i, a in enumerate(schedule) for b in schedule[i + 1:]
+                     if a[0] < b[1] and b[0] < a[1]}
+            self.assertEqual(set(index.conflicts()), pairs)
+
+            start, end, _ = self.window(rng.randint(0, 350), rng.randint(1, 90), None)
+            expected = [exam_id for other_start, other_end, exam_id in schedule
+                        if other_start < end and start < other_end]
+            self.assertEqual(index.overlaps(start, end), expected)
+
+    def test_long_window_does_not_make_queries_linear(self):
+        schedule = [self.window(0, 60 * 24 * 30, 0)] + [self.window(60 * (i + 1), 30, i + 1) for i in range(400)]
+        index = ScheduleIndex(schedule)
+        start, end, _ = self.window(60 * 350 + 40, 10, None)
+
+        visited = []
+        max_end = index.max_end
+
+        class Recording(list):
+            def __getitem__(self, node):
+                visited.append(node)
+                return max_end[node]
+
+        index.max_end = Recording(max_end)
+        self.assertEqual(index.overlaps(start, end), [0])
+        self.assertLess(len(visited), 60)
+
+
+class QuestionImportTests(ExamTestCase):
+    QUESTIONS = 0
+    STUDENTS = 0
+
+    def test_imports_csv_and_jsonl(self):
+        csv_file = io.BytesIO(b"question,marks,correct,a,b,c\n2 + 2?,2,2,3,4,5\nCapital of France?,1,1,Paris,Rome\n")
+        self.assertEqual(import_questions(self.exam, csv_file), 2)
+        jsonl_file = io.BytesIO(b'{"question": "1 + 1?", "marks": 1, "correct": 1, "options": ["2", "3"]}\n')
+        self.assertEqual(import_questions(self.exam, jsonl_file, 'jsonl'), 1)
+
+        self.exam.refresh_from_db()
+        self.assertEqual((self.exam.question_count, self.exam.total_marks), (3, 4))
+        question = Question.objects.get(text='2 + 2?')
+        self.assertEqual(question.Options.get(is_correct=True).text, '4')
+
+    def test_bad_lines_import_nothing(self):
+        csv_file = io.BytesIO(b"ok?,1,1,a,b\nno options?,1,1\nbad marks?,x,1,a,b\nout of range?,1,5,a,b\n")
+        with self.assertRaises(QuestionImportError) as raised:
+            import_questions(self.exam, csv_file, chunk_size=1)
+        self.assertEqual([error.split(':')[0] for error in raised.exception.errors], ['line 2', 'line 3', 'line 4'])
+        self.assertFalse(Question.objects.filter(exam=self.exam).exists())
+
+    def test_options_must_be_a_list(self):
+        jsonl_file = io.BytesIO(b'{"question": "a?", "correct": 1, "options": 5}\n'
+                                b'{"question": "b?", "correct": 1, "options": "abcd"}\n'
+                                b'{"question": "c?", "correct": 1, "options": [{"text": "x"}, "y"]}\n'
+                                b'{"question": "d?", "correct": 2, "options": [3, 4.5]}\n')
+        with self.assertRaises(QuestionImportError) as raised:
+            import_questions(self.exam, jsonl_file, 'jsonl')
+        self.assertEqual(raised.exception.errors,
+                         [f"line {line}: options must be a list of texts" for line in (1, 2, 3)])
+
+    def test_file_that_is_not_utf8(self):
+        latin1 = "Caf\xe9?,1,1,oui,non\n".encode('latin-1')
+        with self.assertRaises(QuestionImportError) as raised:
+            import_questions(self.exam, io.BytesIO(latin1))
+        self.assertIn("not UTF-8", raised.exception.errors[0])
+
+    def test_oversized_csv_field(self):
+        oversized = b'ok?,1,1,a,b\nbig?,1,1,"' + b'x' * 200000 + b'",b\n'
+        with self.assertRaises(QuestionImportError) as raised:
+            import_questions(self.exam, io.BytesIO(oversized))
+        self.assertTrue(raised.exception.errors[0].startswith('line 2'))
+        self.assertFalse(Question.objects.filter(exam=self.exam).exists())
@@ -12,8 +12,16 @@ urlpatterns = [
     path("manageexam/", views.manage_exam, name="manage_exam"),
     path("add-question/<int:exam_id>", views.add_question, name="add_question"),
     path("manageexam/<int:exam_id>", views.update_exam, name="update_exam"),
+    path("manageexam/<int:exam_id>/item-analysis", views.exam_item_analysis, name="exam_item_analysis"),
+    path("manageexam/<int:exam_id>/leaderboard", views.exam_leaderboard, name="exam_leaderboard"),
+    path("gradebook/", views.gradebook_semester_list, name="gradebook_semester_list"),
+    path("gradebook/<int:semester>", views.semester_gradebook, name="semester_gradebook"),
     path("manage-question/<int:question_id>", views.update_question, name="update_question"),
     path("exam/<int:exam_id>/add-question", views.add_question, name="add_question"),
+    path("exam/<int:exam_id>/save-paper", views.save_exam_paper, name="save_exam_paper"),
+    path("exam/<int:exam_id>/import-questions", views.import_questions, name="import_questions"),
+    path("exam/<int:exam_id>/export-results", views.export_exam_results, name="export_exam_results"),
+    path("exam/<int:exam_id>/clone", views.clone_exam, name="clone_exam"),
     path("exam/<int:exam_id>/delete-question/<int:question_id>", views.delete_question, name="delete_question"),
     path("manage_material/", views.manage_material, name="manage_material"),
     path("material-delete/<int:material_id>", views.delete_material, name="delete_material"),
@@ -3,13 +3,23 @@ from django.contrib.auth import authenticate, login, logout
 from users.models import CustomUser
 from django.contrib.auth.decorators import login_required
 from .models import TeacherProfile, TeacherMaterial, TimeTable, Attendance
-from exam.models import Exam, Question, Option, Notification
+from exam.models import Exam, Question, Option, Notification, StudentExamSummary, ProctoringSummary
+from exam.regrade import regrade_questions
+from exam.summaries import recompute_exam_summaries
+from exam.item_analysis import get_item_analysis
+from exam.leaderboard import get_standing
+from exam import question_import, cloning
+from exam.paper_editor import save_paper, PaperEditError
+from exam.results_export import export_response
+from exam import gradebook
+from exam.schedule import find_conflicts
 from student.models import StudentProfile
 from django.http import Http404
 from django.contrib import messages
 from django.utils.timezone import make_aware
 from django.utils import timezone
 from datetime import datetime, date
+import json
 
 
 # Create your views here.
@@ -74,6 +84,13 @@ def teacher_logout(request):
     return redirect("faculty:teacher_login")
 
 
+def conflict_message(exam_ids):
+    clashes = Exam.objects.filter(id__in=exam_ids).order_by('start_time')
+    return "This time window overlaps " + ", ".join(
+        f'"{clash.title}" ({clash.start_time:%d %b %H:%M} - {clash.end_time:%d %b %H:%M})' for clash in clashes
+    ) + " for the same semester."
+
+
 @login_required
 def create_exam(request):
     # get teacher profile
@@ -87,6 +104,23 @@ def create_exam(request):
         end_time = request.POST.get('end_time')
         duration_minutes = request.POST.get('duration_minutes')
 
+        try:
+            start_time = make_aware(datetime.strptime(start_time, '%Y-%m-%dT%H:%M'))
+            end_time = make_aware(datetime.strptime(end_time, '%Y-%m-%dT%H:%M'))
+            samester = int(samester)
+        except (TypeError, ValueError):
+            messages.error(request, "Please enter a valid semester and time window.")
+            return render(request, "faculty/teacher_exam_create.html")
+
+        if end_time <= start_time:
+            messages.error(request, "End time must be after start time.")
+            return render(request, "faculty/teacher_exam_create.html")
+
+        # the same cohort can't sit two exams at once
+        conflicts = find_conflicts(teacher.department_id, samester, start_time, end_time)
+        if conflicts:
+            messages.error(request, conflict_message(conflicts))
+            return render(request, "faculty/teacher_exam_create.html")
 
         # Now create Exam
         exam = Exam.objects.create(
@@ -108,50 +142,6 @@ def create_exam(request):
     return render(request, "faculty/teacher_exam_create.html")
     
 
-@login_required
-def add_question(request, exam_id):
-    # get the exam with exam_id
-
-
-    exam = get_object_or_404(Exam, id=exam_id)
-
-    # check if current teacher created exam or not
-    if request.user !=exam.teacher.user:
-        raise Http404("You are not authorized to add questions")
-    
-    if request.method == "POST":
-        question_text = request.POST.get("question_text")
-        marks = request.POST.get('marks')
-
-        question = Question.objects.create(
-            exam=exam,
-            text=question_text,
-            marks=marks
-        )
-
-        # now for options
-
-        option_texts = request.POST.getlist('option_texts')
-        correct_option = request.POST.get('correct_option')
-
-
-        for idx, option_text in enumerate(option_texts):
-            is_correct = (str(idx) == correct_option)
-
-            Option.objects.create(
-                question=question,
-                text=option_text,
-                is_correct=is_correct
-            )
-
-            return redirect('faculty:add_question', exam_id=exam.id)
-        
-        
-
-    
-    return render(request, "faculty/teacher_add_question.html")
-
-
 @login_required
 def manage_exam(request):
     exams = Exam.objects.all()
@@ -169,12 +159,20 @@ def update_exam(request, exam_id):
             #  ------------------- UPDATE EXAM INFO --------------------------------
             exam.title = request.POST.get('exam_title')
             exam.description = request.POST.get('description')
-            exam.samester = request.POST.get('exam_samester')
+            exam.samester = int(request.POST.get('exam_samester'))
             exam.duration_miniutes = request.POST.get('exam_duration')
-            exam.start_time = request.POST.get('start_time')
-            exam.end_time = request.POST.get('end_time')
-            exam.save()
-            messages.success(request, "Exam Info Update Succesfully")
+            exam.start_time = make_aware(datetime.strptime(request.POST.get('start_time'), '%Y-%m-%dT%H:%M'))
+            exam.end_time = make_aware(datetime.strptime(request.POST.get('end_time'), '%Y-%m-%dT%H:%M'))
+
+            conflicts = find_conflicts(exam.department_id, exam.samester, exam.start_time, exam.end_time,
+                                       exclude_id=exam.id)
+            if exam.end_time <= exam.start_time:
+                messages.error(request, "End time must be after start time.")
+            elif conflicts:
+                messages.error(request, conflict_message(conflicts))
+            else:
+                exam.save()
+                messages.success(request, "Exam Info Update Succesfully")
 
         except Exception as e:
             messages.error(request, f"Error Occured {e}")
@@ -186,22 +184,151 @@ def update_exam(request, exam_id):
     return render(request, "faculty/teacher_update_exam.html", context)
 
 
+@login_required
+def clone_exam(request, exam_id):
+    exam = get_object_or_404(Exam, id=exam_id)
+    teacher = get_object_or_404(TeacherProfile, user=request.user)
+    questions = Question.objects.filter(exam=exam).order_by('id')
+
+    if request.method == "POST":
+        try:
+            start_time = make_aware(datetime.strptime(request.POST.get('start_time'), '%Y-%m-%dT%H:%M'))
+            end_time = make_aware(datetime.strptime(request.POST.get('end_time'), '%Y-%m-%dT%H:%M'))
+            samester = int(request.POST.get('semester'))
+            duration = int(request.POST.get('duration_minutes'))
+        except (TypeError, ValueError):
+            messages.error(request, "Please enter a valid semester, duration and time window.")
+            return redirect("faculty:clone_exam", exam_id=exam.id)
+
+        if end_time <= start_time or duration < 1:
+            messages.error(request, "End time must be after start time and duration at least 1 minute.")
+            return redirect("faculty:clone_exam", exam_id=exam.id)
+
+        conflicts = find_conflicts(teacher.department_id, samester, start_time, end_time)
+        if conflicts:
+            messages.error(request, conflict_message(conflicts))
+            return redirect("faculty:clone_exam", exam_id=exam.id)
+
+        # unticked questions are left out of the copy
+        question_ids = [int(question_id) for question_id in request.POST.getlist('questions') if question_id.isdigit()]
+        if not question_ids:
+            messages.error(request, "Select at least one question to copy.")
+            return redirect("faculty:clone_exam", exam_id=exam.id)
+
+        clone = cloning.clone_exam(
+            exam, teacher, start_time, end_time,
+            question_ids=question_ids,
+            title=request.POST.get('title'),
+            description=request.POST.get('description'),
+            samester=samester,
+            duration_miniutes=duration,
+        )
+        messages.success(request, f"Exam Cloned Successfully with {clone.question_count} Questions")
+        return redirect("faculty:update_exam", exam_id=clone.id)
+
+    return render(request, "faculty/teacher_clone_exam.html", {'exam': exam, 'questions': questions})
+
+
+@login_required
+def exam_item_analysis(request, exam_id):
+    exam = get_object_or_404(Exam, id=exam_id)
+
+    # only the teacher who created the exam can see its analysis
+    if request.user != exam.teacher.user:
+        raise Http404("You are not authorized to view this exam")
+
+    return render(request, "faculty/teacher_exam_item_analysis.html", {'exam': exam,
+                                                                      'report': get_item_analysis(exam)})
+
+
+@login_required
+def exam_leaderboard(request, exam_id):
+    exam = get_object_or_404(Exam.objects.select_related('leaderboard', 'teacher__user'), id=exam_id)
+
+    # marks and integrity events of every student, only for the teacher who created the exam
+    if request.user != exam.teacher.user:
+        raise Http404("You are not authorized to view this exam")
+
+    standing = get_standing(exam)
+
+    summaries = StudentExamSummary.objects.filter(exam=exam).select_related('student').order_by('-total_marks')
+    # integrity event counts come from the per-attempt summary rows, not the raw events
+    proctoring = {row.student_id: row for row in ProctoringSummary.objects.filter(exam=exam)}
+    rows = [
+        {
+            'summary': summary,
+            'rank': standing.rank(summary.total_marks),
+            'percentile': standing.percentile(summary.total_marks),
+            'proctoring': proctoring.get(summary.student_id),
+        }
+        for summary in summaries
+    ]
+
+    return render(request, "faculty/teacher_exam_leaderboard.html", {'exam': exam,
+                                                                    'rows': rows,
+                                                                    'students': standing.students})
+
+
+@login_required
+def export_exam_results(request, exam_id):
+    exam = get_object_or_404(Exam, id=exam_id)
+
+    if request.user != exam.teacher.user:
+        raise Http404("You are not authorized to view this exam")
+
+    # streamed straight from the database, one student per row
+    return export_response(exam)
+
+
+@login_required
+def gradebook_semester_list(request):
+    teacher = get_object_or_404(TeacherProfile, user=request.user)
+    semesters = Exam.objects.filter(department=teacher.department).values_list(
+        'samester', flat=True).distinct().order_by('samester')
+    return render(request, "faculty/teacher_gradebook_semester_list.html", {'semesters': semesters})
+
+
+@login_required
+def semester_gradebook(request, semester):
+    teacher = get_object_or_404(TeacherProfile, user=request.user)
+
+    # one pre-aggregated row per student, see exam/gradebook.py
+    if request.GET.get('export') == 'csv':
+        return gradebook.export_response(teacher.department_id, semester)
+
+    exams, rows = gradebook.semester_gradebook(teacher.department_id, semester)
+    return render(request, "faculty/teacher_semester_gradebook.html", {'semester': semester,
+                                                                      'exams': exams,
+                                                                      'rows': rows})
+
+
 @login_required
 def update_question(request, question_id):
     question = get_object_or_404(Question, id=question_id)
 
     if request.method == "POST":
         try:
+            old_marks = question.marks
             question.text = request.POST.get(f"q_text_{question.id}")
-            question.marks = request.POST.get(f"q_marks_{question.id}")
+            question.marks = int(request.POST.get(f"q_marks_{question.id}"))
             question.save()
 
             correct_option_id = request.POST.get(f"q_correct_{question.id}")
+            key_changed = question.marks != old_marks
             for option in question.Options.all():
                 option_text = request.POST.get(f"q_option_{question.id}_{option.id}")
+                is_correct = (str(option.id) == correct_option_id)
+                key_changed = key_changed or option.is_correct != is_correct
                 option.text = option_text
-                option.is_correct = (str(option.id) == correct_option_id)
+                option.is_correct = is_correct
                 option.save()
+
+            # cached answer key / paper of this exam is now stale
+            question.exam.bump_version()
+
+            # answers already submitted for this question are regraded in place
+            if key_changed:
+                regrade_questions(question.exam, [question.id])
             
             messages.success(request, "Question and options updated successfully!")
 
@@ -245,11 +372,57 @@ def add_question(request, exam_id):
                 is_correct=(idx == correct_index)
             )
 
+        exam.bump_version()
         messages.success(request, "Question Added Successfully")
         return redirect("faculty:update_exam", exam_id=exam.id)
 
     return redirect("faculty:update_exam", exam_id=exam.id)
 
+@login_required
+def save_exam_paper(request, exam_id):
+    exam = get_object_or_404(Exam, id=exam_id)
+
+    if request.user != exam.teacher.user:
+        raise Http404("You are not authorized to edit this exam")
+
+    if request.method == "POST":
+        try:
+            questions = json.loads(request.POST.get("payload") or "{}").get("questions", [])
+            changes = save_paper(exam, questions)
+        except (ValueError, AttributeError):
+            messages.error(request, "Could not read the exam, please try again.")
+        except PaperEditError as e:
+            messages.error(request, "Nothing saved. " + "; ".join(e.errors))
+        else:
+            messages.success(request, f"Exam Saved Successfully: {changes['created']} created, "
+                                      f"{changes['updated']} updated, {changes['deleted']} deleted")
+
+    return redirect("faculty:update_exam", exam_id=exam.id)
+
+
+@login_required
+def import_questions(request, exam_id):
+    exam = get_object_or_404(Exam, id=exam_id)
+
+    if request.user != exam.teacher.user:
+        raise Http404("You are not authorized to add questions")
+
+    if request.method == "POST":
+        question_file = request.FILES.get("question_file")
+        if not question_file:
+            messages.error(request, "Please choose a CSV or JSONL file.")
+            return redirect("faculty:update_exam", exam_id=exam.id)
+
+        try:
+            imported = question_import.import_questions(exam, question_file, question_import.guess_format(question_file.name))
+        except question_import.QuestionImportError as e:
+            messages.error(request, "Nothing imported. " + "; ".join(e.errors))
+        else:
+            messages.success(request, f"{imported} Questions Imported Successfully")
+
+    return redirect("faculty:update_exam", exam_id=exam.id)
+
+
 @login_required
 def delete_question(request, exam_id, question_id):
     # Retrieve the exam and question
@@ -271,6 +444,11 @@ def delete_question(request, exam_id, question_id):
 
     # Delete the question and all related options (because of on_delete=models.CASCADE)
     question.delete()
+    exam.bump_version()
+
+    # the deleted answers no longer count towards anyone's total
+    if StudentExamSummary.objects.filter(exam=exam).exists():
+        recompute_exam_summaries(exam.id)
 
     messages.success(request, "Question deleted successfully")
     return redirect("faculty:update_exam", exam_id=exam.id)
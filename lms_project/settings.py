@@ -95,6 +95,29 @@ DATABASES = {
 }
 
 
+# Cache
+# Shared by every gunicorn worker: compiled answer keys, rendered papers,
+# attempt windows, autosave and proctoring buffers. Exam days run on Redis
+# (set REDIS_URL). The file cache is the single-box fallback and stays at
+# Django's default size: FileBasedCache lists its whole directory on every
+# set() to cull, so a large MAX_ENTRIES makes each write slower as it fills.
+
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": BASE_DIR / ".django_cache",
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -219,4 +242,36 @@ JAZZMIN_UI_TWEAKS = {
         "success": "btn-success"
     },
     "actions_sticky_top": False
-}
\ No newline at end of file
+}
+
+# ---------------------- exam -------------------------
+# When on, submitted papers go into the ExamSubmission queue and are graded by
+# `python manage.py grade_submissions` instead of inside the request.
+EXAM_GRADING_QUEUE = False
+
+# Give every student their own (deterministic) order of questions and options.
+EXAM_SHUFFLE_PAPERS = True
+
+# Submits this many seconds after an attempt's deadline are still accepted.
+EXAM_SUBMIT_GRACE_SECONDS = 30
+
+# Serve the paper this many questions at a time (0 = whole paper on one page).
+EXAM_PAGE_SIZE = 0
+
+# Offline halls may hand their answers in this many seconds after the submit grace.
+EXAM_OFFLINE_RECONNECT_SECONDS = 300
+
+
+# ---------------------- logging -------------------------
+# exam grading logs per-submission timing and query counts at INFO
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "exam": {"handlers": ["console"], "level": "INFO"},
+    },
+}
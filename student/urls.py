@@ -10,6 +10,13 @@ urlpatterns = [
     path("student/profile/", views.student_profile, name="student_profile"),
     path("student/available-exams", views.available_exams, name="available_exams"),
     path("student/start-exam/<int:exam_id>", views.start_exam, name="start_exam"),
+    path("student/start-exam/<int:exam_id>/page/<int:page>", views.exam_page, name="exam_page"),
+    path("student/start-exam/<int:exam_id>/autosave", views.autosave_exam, name="autosave_exam"),
+    path("student/start-exam/<int:exam_id>/events", views.proctoring_events, name="proctoring_events"),
+    path("student/offline-exam/<int:exam_id>/bundle", views.offline_bundle, name="offline_bundle"),
+    path("student/offline-exam/<int:exam_id>/submit", views.offline_submit, name="offline_submit"),
+    path("student/exam-results/", views.exam_results, name="exam_results"),
+    path("student/submission/<uuid:receipt>", views.submission_status, name="submission_status"),
     path("student/student_material/", views.student_material, name="student_material"),
     path("student/time-table/", views.time_table, name="time_table"),
     path("student/show-attendance/", views.student_show_attendance, name="student_show_attendance"),
@@ -1,17 +1,35 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from users.models import CustomUser
 from .models import StudentProfile
 from faculty.models import TeacherMaterial, TimeTable, Attendance
 from exam.models import Exam
-from exam.models import Question, Option, StudentExamResult, StudentExamSummary, Notification
+from exam.models import Question, Option, StudentExamResult, StudentExamSummary, Notification, ExamSubmission
+from exam.grading import answers_from_post
+from exam.autosave import record_answers, seal_attempt, saved_answers
+from exam.submission_queue import enqueue_submission
+from exam.leaderboard import get_standing
+from exam.answer_key import get_answer_key
+from exam.paper import paper_blocks, paper_page, page_count, get_paper
+from exam.schedule import open_exam_ids
+from exam.attempts import get_attempt, start_attempt, mark_submitted
+from exam.offline import (get_bundle, attempt_token, checksum_key_for, read_submission, token_max_age, is_late,
+                          OfflineSubmissionError)
+from exam.proctoring import clean_events, record_events, flush_events
+from exam.idempotency import (new_submission_key, claim_submission, stored_outcome, store_outcome,
+                              release_submission, PENDING)
 from django.contrib.auth import authenticate, login, logout
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import require_POST
+from django.http import HttpResponse, JsonResponse, Http404
 from django.contrib import messages
 from django.utils import timezone
-from django.db.models import Sum
 from django.db import transaction
 from datetime import datetime
 from collections import defaultdict
+import hashlib
+import json
 
 
 # Create your views here.
@@ -123,12 +141,11 @@ def available_exams(request):
     current_time = timezone.now()
     
     # get exam based of department samester and start and end time
-    exams =  Exam.objects.filter(
-        department=student.department,
-        samester=student.samester,
-        start_time__lte=current_time,
-        end_time__gte=current_time
-    ).annotate(total_marks = Sum('question__marks'))
+    # the cohort's exam windows are cached, total marks are stored on the exam
+    exam_ids = open_exam_ids(student.department_id, student.samester, current_time)
+    # the cohort is checked again, a cached schedule may be a moment behind an exam that moved
+    exams = Exam.objects.filter(id__in=exam_ids, department_id=student.department_id,
+                                samester=student.samester).order_by('start_time')
     return render(request, "student/student_available_exam.html", {'exams': exams})
 
 
@@ -137,7 +154,6 @@ def start_exam(request, exam_id):
     # Fetch the exam
     exam = get_object_or_404(Exam, id=exam_id)
     student = get_object_or_404(StudentProfile, user=request.user)
-    questions = Question.objects.filter(exam=exam).prefetch_related('Options')
 
     # # Check if student has already given the exam
     # summary = StudentExamSummary.objects.filter(student=student, exam=exam).first()
@@ -147,79 +163,267 @@ def start_exam(request, exam_id):
     #     return redirect("available_exams")
 
     current_time = timezone.now()
+
+    if request.method == "POST":
+        # the deadline is checked against the attempt registry, one cache read
+        attempt = get_attempt(exam, student)
+        if attempt is None:
+            return redirect("student:available_exams")
+
+        # a double-click or retry of the same paper gets the first outcome back, no regrade
+        submission_key = request.POST.get("submission_key")
+        if submission_key and not claim_submission(exam, student, submission_key):
+            outcome = stored_outcome(exam, student, submission_key)
+            if outcome == PENDING:
+                messages.info(request, "Your submission is still being processed")
+                return redirect('student:available_exams')
+        else:
+            try:
+                posted_answers = answers_from_post(request.POST, get_answer_key(exam))
+                outcome = submit_exam(exam, student, posted_answers, attempt.is_over(current_time))
+            except Exception:
+                if submission_key:
+                    release_submission(exam, student, submission_key)
+                raise
+            if submission_key:
+                store_outcome(exam, student, submission_key, outcome)
+
+        messages.add_message(request, outcome['level'], outcome['message'])
+        return redirect(outcome['url'])
+
     if current_time < exam.start_time or current_time > exam.end_time:
         return redirect("student:available_exams")
 
-    # Check if the exam time has started
-    session_key = f"exam_start_time_{exam.id}_{student.id}"
-    if session_key not in request.session:
-        request.session[session_key] = timezone.now().isoformat()  # Save exam start time
-
-    
+    # the first open starts the clock, reloading the page does not reset it
+    attempt = start_attempt(exam, student)
+    if attempt.submitted:
+        messages.info(request, "You have already submitted this exam")
+        return redirect("student:available_exams")
+    if attempt.is_over(current_time):
+        messages.info(request, "Your time for this exam is over")
+        return redirect("student:available_exams")
 
-    if request.method == "POST":
-        total_marks = 0
-        total_questions = 0
-        exam_results = []
+    # Passing remaining time to the template
+    # question blocks are rendered once per exam version and shared by every student,
+    # only their order is per student
+    # in paged mode only the first page comes with the shell, the rest is fetched page by page
+    page_size = settings.EXAM_PAGE_SIZE
+    if page_size:
+        paper = paper_page(exam, student, 0, page_size)
+        pages = page_count(exam, page_size)
+    else:
+        paper = paper_blocks(exam, student)
+        pages = 1
 
-        # Loop over all the questions
-        for question in questions:
-            selected_option_id = request.POST.get(f"q_correct_{question.id}")
-            try:
-                selected_option = Option.objects.get(id=selected_option_id)
-                is_correct = selected_option.is_correct
-                mark_obtains = question.marks if is_correct else 0
-            except (Option.DoesNotExist, TypeError):
-                selected_option = None
-                is_correct = False
-                mark_obtains = 0
-
-            # Save result per question
-            exam_result = StudentExamResult.objects.update_or_create(
-                student=student,
-                exam=exam,
-                question=question,
-                defaults={
-                    'selected_option': selected_option,
-                    'is_correct': is_correct,
-                    'mark_obtains': mark_obtains,
-                }
-            )
-
-            # Collect exam results for the summary
-            exam_results.append(exam_result[0])
-            total_marks += mark_obtains
-            if is_correct:
-                total_questions += 1
-
-        # # Create or update the Student Exam Summary
-        # summary, created = StudentExamSummary.objects.update_or_create(
-        #     student=student,
-        #     exam=exam,
-        #     defaults={
-        #         'total_marks': total_marks,
-        #         'total_questions': total_questions,
-        #     }
-        # )
-
-        # # Add the exam results to the summary
-        # summary.exam_results.set(exam_results)
-
-        # # Calculate the summary totals (marks and questions)
-        # summary.calculate_summary()
-        # summary.has_attempted = False
-        # summary.save()
-
-        messages.success(request, f"Exam submitted successfully! Your total marks: {total_marks}")
-        return redirect('student:available_exams')
+    # answers autosaved earlier are ticked again after a reload
+    saved = {str(question_id): str(option_id) for question_id, option_id in saved_answers(exam, student).items()}
 
-    # Passing remaining time to the template
     return render(request, "student/student_start_exam.html", {'exam': exam, 
-                                                               'questions': questions, 
+                                                               'paper': paper, 
+                                                               'pages': pages,
+                                                               'saved_answers': saved,
+                                                               'remaining_seconds': attempt.remaining_seconds(current_time),
+                                                               'submission_key': new_submission_key(),
                                                                })
 
 
+@login_required
+def exam_page(request, exam_id, page):
+    exam = get_object_or_404(Exam, id=exam_id)
+    student = get_object_or_404(StudentProfile, user=request.user)
+
+    attempt = get_attempt(exam, student)
+    if attempt is None or attempt.submitted or attempt.is_over():
+        return JsonResponse({'error': 'Exam is not open'}, status=403)
+
+    page_size = settings.EXAM_PAGE_SIZE or len(get_paper(exam)) or 1
+    if page >= page_count(exam, page_size):
+        raise Http404("No such page")
+
+    # a slice of the cached paper, a few kB instead of the whole paper
+    return render(request, "student/student_exam_page.html", {'paper': paper_page(exam, student, page, page_size),
+                                                              'offset': page * page_size})
+
+
+def submit_exam(exam, student, posted_answers, late):
+    '''Grade or enqueue the posted paper, returns the outcome shown to the student.'''
+    if late:
+        # time ran out: only what was autosaved before the deadline counts
+        posted_answers = {}
+
+    if settings.EXAM_GRADING_QUEUE:
+        # accept the paper now, grading workers fill in the score later
+        submission = enqueue_submission(exam, student, posted_answers)
+        mark_submitted(exam, student)
+        flush_events(exam, student)
+        if late:
+            message = "Time was over, answers saved before the deadline were submitted."
+        else:
+            message = "Exam submitted successfully! Your result will be ready shortly."
+        return {
+            'level': messages.WARNING if late else messages.SUCCESS,
+            'message': message,
+            'url': reverse('student:submission_status', args=[submission.receipt]),
+        }
+
+    # grade the whole paper in memory, answers already autosaved are not written again
+    report = seal_attempt(exam, student, get_answer_key(exam), posted_answers)
+    mark_submitted(exam, student)
+    flush_events(exam, student)
+    total_marks = report.total_marks
+
+    if late:
+        message = f"Time was over, answers saved before the deadline were submitted. Your total marks: {total_marks}"
+    else:
+        message = f"Exam submitted successfully! Your total marks: {total_marks}"
+    return {
+        'level': messages.WARNING if late else messages.SUCCESS,
+        'message': message,
+        'url': reverse('student:available_exams'),
+    }
+
+
+@login_required
+def offline_bundle(request, exam_id):
+    exam = get_object_or_404(Exam, id=exam_id)
+    student = get_object_or_404(StudentProfile, user=request.user)
+
+    current_time = timezone.now()
+    if current_time < exam.start_time or current_time > exam.end_time:
+        return JsonResponse({'error': 'Exam is not open'}, status=403)
+
+    attempt = start_attempt(exam, student)
+    if attempt.submitted:
+        return JsonResponse({'error': 'You have already submitted this exam'}, status=403)
+    if attempt.is_over(current_time):
+        return JsonResponse({'error': 'Your time for this exam is over'}, status=403)
+
+    # the same compressed bytes for every student, only the headers are per attempt
+    bundle = get_bundle(exam)
+    token = attempt_token(exam, student)
+    response = HttpResponse(bundle, content_type='application/json')
+    response['Content-Encoding'] = 'gzip'
+    response['X-Attempt-Token'] = token
+    response['X-Checksum-Key'] = checksum_key_for(token)
+    response['X-Remaining-Seconds'] = attempt.remaining_seconds(current_time)
+    return response
+
+
+@login_required
+@require_POST
+def offline_submit(request, exam_id):
+    exam = get_object_or_404(Exam, id=exam_id)
+    student = get_object_or_404(StudentProfile, user=request.user)
+
+    attempt = get_attempt(exam, student)
+    if attempt is None:
+        return JsonResponse({'error': 'Exam was not started'}, status=403)
+
+    # body: {"token": "...", "answers": "<json of question id -> option id>", "checksum": "<hex hmac>"}
+    try:
+        body = json.loads(request.body)
+        token = body['token']
+        answers = read_submission(exam, student, token, body['answers'], body['checksum'], token_max_age(exam))
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Invalid submission'}, status=400)
+    except OfflineSubmissionError as e:
+        return JsonResponse({'error': str(e)}, status=403)
+
+    # the hall may resend when the reply is lost, the token identifies the submission
+    submission_key = hashlib.sha256(token.encode()).hexdigest()
+    if not claim_submission(exam, student, submission_key):
+        outcome = stored_outcome(exam, student, submission_key)
+        if outcome == PENDING:
+            return JsonResponse({'error': 'Submission is still being processed'}, status=409)
+    else:
+        try:
+            # offline halls never autosave, their answers count for the whole reconnect window
+            outcome = submit_exam(exam, student, answers, is_late(attempt))
+        except Exception:
+            release_submission(exam, student, submission_key)
+            raise
+        store_outcome(exam, student, submission_key, outcome)
+
+    return JsonResponse({'message': outcome['message'], 'redirect': outcome['url']})
+
+
+@login_required
+def submission_status(request, receipt):
+    submission = get_object_or_404(ExamSubmission.objects.select_related('exam'),
+                                   receipt=receipt, student__user=request.user)
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'receipt': str(submission.receipt),
+            'status': submission.status,
+            'total_marks': submission.total_marks,
+        })
+
+    return render(request, "student/student_submission_status.html", {'submission': submission})
+
+
+@login_required
+def exam_results(request):
+    student = get_object_or_404(StudentProfile, user=request.user)
+    summaries = StudentExamSummary.objects.filter(student=student).select_related(
+        'exam', 'exam__leaderboard'
+    ).order_by('-submitted_at')
+
+    # rank and percentile come from the exam leaderboard, no sorting of other students
+    results = []
+    for summary in summaries:
+        standing = get_standing(summary.exam)
+        results.append({
+            'summary': summary,
+            'rank': standing.rank(summary.total_marks),
+            'students': standing.students,
+            'percentile': standing.percentile(summary.total_marks),
+        })
+
+    return render(request, "student/student_exam_results.html", {'results': results})
+
+
+@login_required
+@require_POST
+def autosave_exam(request, exam_id):
+    exam = get_object_or_404(Exam, id=exam_id)
+    student = get_object_or_404(StudentProfile, user=request.user)
+
+    attempt = get_attempt(exam, student)
+    if attempt is None or attempt.submitted or attempt.is_over():
+        return JsonResponse({'error': 'Exam is not open'}, status=403)
+
+    # body: {"answers": {"<question id>": "<option id>", ...}, "flush": false}
+    try:
+        body = json.loads(request.body)
+        deltas = {int(question_id): option_id for question_id, option_id in body.get('answers', {}).items()}
+    except (ValueError, AttributeError):
+        return JsonResponse({'error': 'Invalid answers'}, status=400)
+
+    buffered, written = record_answers(exam, student, get_answer_key(exam), deltas, flush=body.get('flush') is True)
+    return JsonResponse({'buffered': buffered, 'written': written})
+
+
+@login_required
+@require_POST
+def proctoring_events(request, exam_id):
+    exam = get_object_or_404(Exam, id=exam_id)
+    student = get_object_or_404(StudentProfile, user=request.user)
+
+    attempt = get_attempt(exam, student)
+    if attempt is None or attempt.submitted or attempt.is_over():
+        return JsonResponse({'error': 'Exam is not open'}, status=403)
+
+    # body: {"events": [{"type": "copy", "at": <ms since epoch>}, ...]}
+    try:
+        events = json.loads(request.body).get('events', [])
+        if not isinstance(events, list):
+            raise ValueError
+    except (ValueError, AttributeError):
+        return JsonResponse({'error': 'Invalid events'}, status=400)
 
+    buffered, written = record_events(exam, student, clean_events(events, attempt.started_at))
+    return JsonResponse({'buffered': buffered, 'written': written})
 # #################################################
 ##################################################
 @login_required